@@ -1,124 +1,253 @@
-import pandas as pd
 import numpy as np
 import argparse
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.utils.class_weight import compute_class_weight
-from sklearn.inspection import permutation_importance
-import tensorflow as tf
-from tensorflow.keras.models import Sequential, Model
-from tensorflow.keras.layers import Dense, Dropout, BatchNormalization, LeakyReLU, Input
-from tensorflow.keras.regularizers import l2
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping
-import matplotlib.pyplot as plt
+from natality_io import read_natality
+from design_matrix import build_design_matrix
+from features import (FeatureEncoder, factor_mappings, feature_cols, numeric_features, binary_features,
+                      categorical_features)
+from scoring import export_mlp
+from model_registry import publish
+from evaluation import SUBGROUP_COLS, evaluate, format_ci, print_report
+
+# Training script for the MLP. TensorFlow and scikit-learn are imported by the
+# functions that use them, so importing this module (e.g. for build_model) or
+# asking for --help does not start the TensorFlow runtime. The test set is
+# evaluated by evaluation.py, which writes a JSON report and figures (loss
+# curves included) to --report-dir instead of opening plot windows.
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="Run Neural Network on a user-specified CSV file.")
-parser.add_argument("csv_file", type=str, help="Path to the input CSV file")
-args = parser.parse_args()
-
-# Load data
-print("📂 Loading final_data...")
-final_data = pd.read_csv(args.csv_file)
-print("✅ Data loaded successfully from:", args.csv_file)
-
-# Convert categorical variables to factors
-factor_mappings = {
-    'Birth Place': {1: "Hospital", 2: "Freestanding birth center", 3: "Home (intended)", 
-                    4: "Home (not)", 5: "Home (unknown)", 6: "Clinic", 7: "Other"},
-    "Mother's Race/Hispanic": {1: "White", 2: "Black", 3: "AIAN", 4: "Asian", 5: "NHOPI", 
-                                 6: "multirace", 7: "Hispanic"},
-    "Mother's Education": {1: "8th grade or less", 2: "9-12th grade", 3: "High school/GED", 
-                            4: "College credit", 5: "Associate degree", 6: "Bachelor's", 
-                            7: "Master's", 8: "Doctorate"},
-    'TOLAC Attempted (if cesarean)': {'Y': "Y", 'X': "Not applicable"},
-    'Delivery Method': {2: "VBAC", 4: "Repeat C-section"},
-    'Payment': {1: "Medicaid", 2: "Private Insurance", 3: "Self-Pay", 4: "Indian Health Service", 
-                5: "CHAMPUS/TRICARE", 6: "Other Gov", 8: "Other"}
-}
-
-for col, mapping in factor_mappings.items():
-    if col in final_data.columns:
-        final_data[col] = final_data[col].map(mapping).astype("category")
-
-# Convert continuous variables to numeric
-num_cols = ["Prior births now living", "Prior births now dead", "Number of Prenatal Visits", 
-            "Cigarettes before pregnancy", "1st Tri Cigarettes", "2nd Tri Cigarettes", 
-            "3rd Tri Cigarettes", "Weight gain", "Interval Since Last Live Birth"]
-for col in num_cols:
-    if col in final_data.columns:
-        final_data[col] = pd.to_numeric(final_data[col], errors='coerce')
-
-# Create binary target variable
-final_data['Delivery_Method_Binary'] = (final_data['Delivery Method'] == "VBAC").astype(int)
-
-# One-hot encode categorical variables
-final_data = pd.get_dummies(final_data, drop_first=True)
-
-# Print dataset diagnostics
-print("📊 Dataset Shape:", final_data.shape)
-print("📊 Class Distribution:", final_data['Delivery_Method_Binary'].value_counts(normalize=True).to_dict())
-
-# Remove highly correlated features (>0.95)
-corr_matrix = final_data.corr().abs()
-upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-to_drop = [column for column in upper.columns if any(upper[column] > 0.95)]
-
-if to_drop:
-    print(f"⚠️ Removing {len(to_drop)} highly correlated features: {to_drop}")
-    final_data = final_data.drop(columns=to_drop)
-
-# Train-test split (Use 80% for training instead of just 7K samples)
-train_data, test_data = train_test_split(final_data, test_size=0.2, random_state=123, stratify=final_data['Delivery_Method_Binary'])
-
-X_train = train_data.drop(columns=['Delivery_Method_Binary'])
-y_train = train_data['Delivery_Method_Binary']
-X_test = test_data.drop(columns=['Delivery_Method_Binary'])
-y_test = test_data['Delivery_Method_Binary']
-
-# Standardize features
-scaler = StandardScaler()
-X_train = scaler.fit_transform(X_train)
-X_test = scaler.transform(X_test)
-
-# Compute class weights
-classes = np.array([0, 1])
-class_weights = compute_class_weight('balanced', classes=classes, y=y_train.to_numpy())
-class_weight_dict = {0: class_weights[0], 1: class_weights[1]}
-
-# Early stopping
-early_stopping = EarlyStopping(monitor='val_auc', patience=5, restore_best_weights=True, mode='max')
+parser.add_argument("csv_file", type=str,
+                    help="Path to the input CSV file, or a Parquet file/directory written by make_csv.py")
+parser.add_argument("--years", type=int, nargs="+", help="Only use these birth years")
+parser.add_argument("--streaming", action="store_true",
+                    help="Stream the data from disk in chunks every epoch instead of loading it (flat memory)")
+parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per chunk with --streaming")
+parser.add_argument("--intra-op-threads", type=int, default=0,
+                    help="Threads used within one TensorFlow op (default 0: one per core)")
+parser.add_argument("--inter-op-threads", type=int, default=0,
+                    help="TensorFlow ops run concurrently (default 0: chosen by TensorFlow)")
+parser.add_argument("--data-threads", type=int, default=0,
+                    help="Threads for the input pipeline (default 0: TensorFlow's shared pool)")
+parser.add_argument("--parallel-calls", type=int, default=0,
+                    help="Batches standardized in parallel by the input pipeline (default 0: autotuned)")
+parser.add_argument("--export", action="store_true",
+                    help="Train on the /predict input fields and export the network to models/tolac_mlp.json "
+                         "for predict.py")
+parser.add_argument("--publish", choices=["current", "candidate"],
+                    help="Publish the exported network to the registry served by predict.py (implies --export)")
+parser.add_argument("--report-dir", default="reports", help="Where the evaluation report and figures are written")
+parser.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap resamples for the AUROC confidence intervals")
+parser.add_argument("--workers", type=int, default=0, help="Worker processes for the evaluation report (default: every CPU)")
+
+
+# CPU threads, set before TensorFlow starts its runtime. Returns the tf.data
+# options for the input pipelines.
+def configure_threads(intra_op_threads=0, inter_op_threads=0, data_threads=0):
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    options = tf.data.Options()
+    if data_threads:
+        options.threading.private_threadpool_size = data_threads
+    return options
+
+
+# Streaming input: one pass for the levels, correlations, scaling statistics
+# and class balance; every epoch then streams the file again. Returns
+# (train_dataset, test_dataset, class_weight_dict, encoder, mean, scale,
+# groups_test), groups_test holding the evaluation subgroups of the test rows.
+def streaming_datasets(path, years, chunk_rows, features=None, parallel_calls=None, options=None):
+    from streaming_mlp import collect_statistics, make_datasets, test_columns
+
+    print("📂 Scanning final_data...")
+    encoder, mean, scale, dtypes, stats, to_drop = collect_statistics(path, years, chunk_rows, features)
+    print("✅ Data scanned successfully from:", path)
+    print("📊 Dataset Shape:", (stats.rows, len(encoder.feature_names) + len(to_drop)))
+    print("📊 Class Distribution:", {1: stats.positives / stats.rows, 0: 1 - stats.positives / stats.rows})
+    if to_drop:
+        print(f"⚠️ Removing {len(to_drop)} highly correlated features: {to_drop}")
+    train_dataset, test_dataset = make_datasets(path, years, chunk_rows, dtypes, encoder, mean, scale,
+                                                parallel_calls=parallel_calls, options=options)
+
+    # Class weights as compute_class_weight('balanced') on the training rows
+    train_counts = np.array([stats.train_rows - stats.train_positives, stats.train_positives])
+    class_weights = stats.train_rows / (2 * train_counts)
+    class_weight_dict = {0: class_weights[0], 1: class_weights[1]}
+    groups_test = test_columns(path, years, chunk_rows, SUBGROUP_COLS)
+    return train_dataset, test_dataset, class_weight_dict, encoder, mean, scale, groups_test
+
+
+# In-memory input: the whole file is loaded and encoded into a compact design
+# matrix. Same return values as streaming_datasets().
+def in_memory_datasets(path, years, features=None, options=None):
+    import pandas as pd
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from sklearn.utils.class_weight import compute_class_weight
+
+    # Load data
+    print("📂 Loading final_data...")
+    final_data = read_natality(path, years=years)
+    print("✅ Data loaded successfully from:", path)
+
+    # Convert categorical variables to factors
+    for col, mapping in factor_mappings.items():
+        if col in final_data.columns:
+            final_data[col] = final_data[col].map(mapping).astype("category")
+
+    # Convert continuous variables to numeric (missing values are imputed with the
+    # training mean when batches are standardized)
+    for col in numeric_features:
+        if col in final_data.columns:
+            final_data[col] = pd.to_numeric(final_data[col], errors='coerce')
+
+    # Create binary target variable
+    final_data['Delivery_Method_Binary'] = (final_data['Delivery Method'] == "VBAC").astype(int)
+
+    # One-hot encode categorical variables with the shared encoder (the delivery method is the outcome)
+    # into a compact design matrix (small-integer/float32 numeric columns, sparse indicators)
+    predictors = final_data.drop(columns=['Delivery Method', 'Delivery_Method_Binary'])
+    if features:
+        predictors = predictors[feature_cols]
+        encoder = FeatureEncoder(*features).fit(predictors)
+    else:
+        categorical_cols = [col for col in predictors.columns if not pd.api.types.is_numeric_dtype(predictors[col])]
+        numeric_cols = [col for col in predictors.columns if col not in categorical_cols]
+        encoder = FeatureEncoder(numeric_cols, [], categorical_cols).fit(predictors)
+    X = build_design_matrix(encoder, predictors)
+    y = final_data['Delivery_Method_Binary'].to_numpy()
+    groups = final_data[[col for col in SUBGROUP_COLS if col in final_data.columns]]
+    del final_data, predictors
+
+    # Print dataset diagnostics
+    print("📊 Dataset Shape:", X.shape, f"({X.nbytes / 1e6:.1f} MB)")
+    print("📊 Class Distribution:", pd.Series(y).value_counts(normalize=True).to_dict())
+
+    # Remove highly correlated features (>0.95)
+    corr_matrix = X.correlation().abs()
+    upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
+    to_drop = [column for column in upper.columns if any(upper[column] > 0.95)]
+
+    if to_drop:
+        print(f"⚠️ Removing {len(to_drop)} highly correlated features: {to_drop}")
+        X = X.select([col for col in X.feature_names if col not in to_drop])
+        encoder.select(X.feature_names)
+
+    # Train-test split (Use 80% for training instead of just 7K samples)
+    train_rows, test_rows = train_test_split(np.arange(len(X)), test_size=0.2, random_state=123, stratify=y)
+    X_train, X_test = X.take(train_rows), X.take(test_rows)
+    y_train, y_test = y[train_rows], y[test_rows]
+    groups_test = groups.iloc[test_rows].reset_index(drop=True)
+    del X, groups
+
+    # Standardize features with the training mean and standard deviation. Batches
+    # are densified and standardized as Keras consumes them, so only the compact
+    # matrices are held in memory. A missing value becomes 0, the training mean.
+    mean, scale = X_train.column_stats()
+
+    def make_dataset(X, y, shuffle):
+        dataset = tf.data.Dataset.from_generator(
+            lambda: ((np.nan_to_num(x), labels) for x, labels in X.batches(y, batch_size=256, mean=mean, scale=scale,
+                                                                              shuffle=shuffle)),
+            output_signature=(tf.TensorSpec(shape=(None, X.shape[1]), dtype=tf.float32),
+                              tf.TensorSpec(shape=(None,), dtype=tf.float32))
+        ).prefetch(tf.data.AUTOTUNE)
+        return dataset.with_options(options) if options is not None else dataset
+
+    train_dataset = make_dataset(X_train, y_train, shuffle=True)
+    test_dataset = make_dataset(X_test, y_test, shuffle=False)
+
+    # Compute class weights
+    classes = np.array([0, 1])
+    class_weights = compute_class_weight('balanced', classes=classes, y=y_train)
+    class_weight_dict = {0: class_weights[0], 1: class_weights[1]}
+    return train_dataset, test_dataset, class_weight_dict, encoder, mean, scale, groups_test
+
 
 # Build MLP model
-model = Sequential([
-    Input(shape=(X_train.shape[1],)),  
-    Dense(128, kernel_regularizer=l2(0.0001)),
-    BatchNormalization(),
-    LeakyReLU(),
-    Dropout(0.4),
-    Dense(64, kernel_regularizer=l2(0.0001)),
-    BatchNormalization(),
-    LeakyReLU(),
-    Dropout(0.3),
-    Dense(32, kernel_regularizer=l2(0.0001)),
-    BatchNormalization(),
-    LeakyReLU(),
-    Dense(1, activation='sigmoid')
-])
-
-# Train model
-model.compile(optimizer=Adam(learning_rate=0.0001), loss='binary_crossentropy', metrics=['AUC'])
-history = model.fit(X_train, y_train, validation_data=(X_test, y_test),
-                    epochs=60, batch_size=256, class_weight=class_weight_dict, callbacks=[early_stopping], verbose=1)
-
-# Evaluate model
-test_loss, test_auc = model.evaluate(X_test, y_test)
-print(f"\n📊 Test AUROC: {test_auc:.4f}")
-
-# Plot loss curves
-plt.plot(history.history['loss'], label='Train Loss')
-plt.plot(history.history['val_loss'], label='Val Loss')
-plt.legend()
-plt.title("Loss Over Epochs")
-plt.show()
+def build_model(n_features):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout, BatchNormalization, LeakyReLU, Input
+    from tensorflow.keras.metrics import AUC
+    from tensorflow.keras.regularizers import l2
+    from tensorflow.keras.optimizers import Adam
+
+    model = Sequential([
+        Input(shape=(n_features,)),
+        Dense(128, kernel_regularizer=l2(0.0001)),
+        BatchNormalization(),
+        LeakyReLU(),
+        Dropout(0.4),
+        Dense(64, kernel_regularizer=l2(0.0001)),
+        BatchNormalization(),
+        LeakyReLU(),
+        Dropout(0.3),
+        Dense(32, kernel_regularizer=l2(0.0001)),
+        BatchNormalization(),
+        LeakyReLU(),
+        Dense(1, activation='sigmoid')
+    ])
+    # Named explicitly: Keras 3 logs the 'AUC' shorthand as val_AUC, which train_model's early stopping would not find
+    model.compile(optimizer=Adam(learning_rate=0.0001), loss='binary_crossentropy', metrics=[AUC(name='auc')])
+    return model
+
+
+# Train model, with early stopping on the validation AUROC
+def train_model(model, train_dataset, test_dataset, class_weight_dict, epochs=60):
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    early_stopping = EarlyStopping(monitor='val_auc', patience=5, restore_best_weights=True, mode='max')
+    return model.fit(train_dataset, validation_data=test_dataset,
+                     epochs=epochs, class_weight=class_weight_dict, callbacks=[early_stopping], verbose=1)
+
+
+# Outcomes and predicted probabilities of the test rows, in one pass over the dataset
+def predict_dataset(model, dataset):
+    outcomes, probabilities = [], []
+    for x, y in dataset:
+        probabilities.append(model.predict_on_batch(x)[:, 0])
+        outcomes.append(y.numpy())
+    return np.concatenate(outcomes), np.concatenate(probabilities)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    args.export = args.export or bool(args.publish)
+
+    # The exported network is served by predict.py, so it uses the request fields
+    # and the encoder layout of the logistic model instead of every column
+    served_features = (numeric_features, binary_features, categorical_features) if args.export else None
+
+    options = configure_threads(args.intra_op_threads, args.inter_op_threads, args.data_threads)
+    if args.streaming:
+        train_dataset, test_dataset, class_weight_dict, encoder, mean, scale, groups_test = streaming_datasets(
+            args.csv_file, args.years, args.chunk_rows, served_features, args.parallel_calls or None, options)
+    else:
+        train_dataset, test_dataset, class_weight_dict, encoder, mean, scale, groups_test = in_memory_datasets(
+            args.csv_file, args.years, served_features, options)
+
+    model = build_model(len(encoder.feature_names))
+    history = train_model(model, train_dataset, test_dataset, class_weight_dict)
+
+    # Evaluate model: AUROC with a bootstrap confidence interval, calibration,
+    # Brier score and subgroups, plus the loss curves, written to --report-dir
+    y_test, pred_probs = predict_dataset(model, test_dataset)
+    report = evaluate(y_test, pred_probs, groups_test, name="mlp", output_dir=args.report_dir,
+                      n_bootstrap=args.bootstrap, workers=args.workers or None, history=history.history)
+    print(f"\n📊 Test AUROC: {format_ci(report['overall'], report['bootstrap']['confidence'])}")
+    print_report(report)
+
+    # Export the network for predict.py: weights with BatchNormalization folded in,
+    # the standardization statistics and the encoder, served with NumPy only
+    if args.export:
+        mlp_path, bundle_path = export_mlp(model, encoder, mean, scale)
+        print(f"💾 Network saved to {mlp_path} and {bundle_path}")
+        if args.publish:
+            version = publish(bundle_path, "models", candidate=args.publish == "candidate")
+            print(f"📦 Published as {args.publish} model version {version}")
+    return model
+
+
+if __name__ == "__main__":
+    main()
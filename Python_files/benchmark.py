@@ -0,0 +1,383 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.linear_model import LogisticRegression
+from make_csv import (col_names, col_positions, flag_cols, float_cols, years, cohort_mask, parse_block,
+                      read_natality_file, sentinel_filter, to_output_frame)
+from features import FeatureEncoder, factor_mappings, feature_cols, numeric_features, binary_features, categorical_features
+from scoring import LogisticScorer, export_scorer, load_model, write_scorer_file
+from design_matrix import build_design_matrix
+
+# NCHS natality record length, including the line terminator
+RECORD_LENGTH = 1345
+
+STAGES = ["fwf_parse", "filter", "combine", "encode_get_dummies", "encode_feature_encoder", "encode_design_matrix",
+          "lr_fit", "lr_fit_sparse", "mlp_epoch", "predict_single", "predict_batch", "model_load", "serve_startup"]
+
+# Libraries the prediction server should not import
+TRAINING_MODULES = ["pandas", "scipy", "sklearn", "statsmodels", "matplotlib", "tensorflow", "joblib", "pyarrow"]
+
+
+# Column values for n synthetic birth records. About `cohort_share` of them
+# are in the study cohort (singleton, 1-2 previous cesareans, TOLAC Y/X), and
+# a few percent of each field carries its missing/unstated sentinel. The
+# delivery method depends on age, BMI, prior births and previous cesareans,
+# so the models have something to learn.
+def synthetic_values(n, rng, year, cohort_share):
+    def codes(choices, p, unknown=None, unknown_rate=0.02):
+        values = rng.choice(choices, size=n, p=np.array(p) / np.sum(p))
+        if unknown is not None:
+            values = np.where(rng.random(n) < unknown_rate, unknown, values)
+        return values
+
+    def normal(mean, sd, low, high, unknown=None, unknown_rate=0.02):
+        values = np.clip(np.rint(rng.normal(mean, sd, n)), low, high).astype(int)
+        if unknown is not None:
+            values = np.where(rng.random(n) < unknown_rate, unknown, values)
+        return values
+
+    cohort = rng.random(n) < cohort_share
+    values = {
+        "Birth Year": np.full(n, year),
+        "Birth Place": codes([1, 2, 3, 4, 5, 6, 7], [98.4, 0.5, 0.8, 0.05, 0.05, 0.1, 0.1], 9, 0.001),
+        "Mother's Age": normal(30, 5.8, 12, 50),
+        "Mother's Race/Hispanic": codes([1, 2, 3, 4, 5, 6, 7], [50, 14, 0.8, 6, 0.3, 2, 24], 8),
+        "Mother's Education": codes([1, 2, 3, 4, 5, 6, 7, 8], [3, 8, 26, 20, 9, 21, 10, 3], 9),
+        "Prior Births Now Living": normal(1.2, 1.1, 0, 15, 99, 0.005),
+        "Prior Births Now Dead": codes([0, 1, 2], [97, 2.5, 0.5], 99, 0.005),
+        "Interval Since Last Live Birth": normal(40, 28, 6, 300, 999),
+        "Number of Prenatal Visits": normal(11.5, 4, 0, 49, 99),
+        "Cigarettes Before Pregnancy": codes([0, 5, 10, 20], [92, 3, 3, 2], 99, 0.005),
+        "1st Tri Cigarettes": codes([0, 5, 10, 20], [94, 3, 2, 1], 99, 0.005),
+        "2nd Tri Cigarettes": codes([0, 5, 10, 20], [95, 3, 1.5, 0.5], 99, 0.005),
+        "3rd Tri Cigarettes": codes([0, 5, 10, 20], [95.5, 3, 1, 0.5], 99, 0.005),
+        "Pre-pregnancy BMI": np.where(rng.random(n) < 0.03, 99.9,
+                                      np.round(np.clip(rng.lognormal(np.log(27), 0.22, n), 13, 69.9), 1)),
+        "Weight Gain": normal(30, 15, 0, 98, 99, 0.03),
+        "Number of Previous Cesareans": np.where(cohort, codes([1, 2], [80, 20]), codes([0, 1, 2, 3], [85, 10, 4, 1])),
+        "Plurality": np.where(cohort, 1, codes([1, 2, 3], [96.8, 3, 0.2])),
+        "Obstetric Estimate": normal(38.7, 1.8, 20, 47, 99, 0.002),
+        "Payment": codes([1, 2, 3, 4, 5, 6, 8], [42, 50, 4, 0.2, 1.5, 0.8, 1.5], 9)
+    }
+    for col in ["Pre-pregnancy Diabetes", "Gestational Diabetes", "Pre-pregnancy HTN", "Gestational HTN",
+                "Previous Preterm Birth", "Gonorrhea", "Syphilis", "Chlamydia", "Hep B", "Hep C"]:
+        values[col] = codes(["Y", "N"], [6, 94], "U", 0.005)
+    values["Previous Cesarean"] = np.where(values["Number of Previous Cesareans"] > 0, "Y", "N")
+    values["TOLAC Attempted (if cesarean)"] = np.where(
+        values["Number of Previous Cesareans"] > 0, np.where(cohort, codes(["Y", "X"], [15, 85]), "N"), "X")
+    logit = (1.2 - 0.03 * (values["Mother's Age"] - 30) - 0.05 * np.minimum(values["Pre-pregnancy BMI"] - 27, 30)
+             + 0.6 * (values["Prior Births Now Living"] % 99 > 1) - 1.5 * (values["Number of Previous Cesareans"] == 2))
+    vbac = rng.random(n) < 1 / (1 + np.exp(-logit))
+    values["Delivery Method"] = np.where(vbac, 2, codes([4, 1], [90, 10]))
+    return values
+
+
+# Render column values as fixed-width records in the col_specs layout
+def synthetic_block(n, seed=0, year=2021, cohort_share=0.1, record_length=RECORD_LENGTH):
+    rng = np.random.default_rng(seed)
+    values = synthetic_values(n, rng, year, cohort_share)
+    block = np.full((n, record_length), ord(" "), dtype=np.uint8)
+    block[:, -1] = ord("\n")
+    for col in col_names:
+        start, end = col_positions[col]
+        width = end - start
+        if col in flag_cols:
+            block[:, start] = np.frombuffer(values[col].astype("S1").tobytes(), dtype=np.uint8)
+        elif col in float_cols:
+            text = np.char.rjust(np.char.mod("%.1f", values[col]), width).astype(f"S{width}")
+            block[:, start:end] = np.frombuffer(text.tobytes(), dtype=np.uint8).reshape(n, width)
+        else:
+            powers = 10 ** np.arange(width - 1, -1, -1)
+            block[:, start:end] = (values[col][:, None] // powers) % 10 + ord("0")
+    return block
+
+
+def write_synthetic_fwf(path, n_records, seed=0, year=2021, cohort_share=0.1):
+    synthetic_block(n_records, seed, year, cohort_share).tofile(path)
+    return path
+
+
+# A cleaned per-year frame in the make_csv.py output layout: cohort records
+# that pass the missing/unstated filter
+def synthetic_cleaned_frame(n_rows, seed=0, year=2021):
+    block = synthetic_block(int(n_rows * 1.25) + 100, seed, year, cohort_share=1.0)
+    df = parse_block(block[cohort_mask(block)])
+    keep, _ = sentinel_filter(df)
+    return to_output_frame(df[keep].head(n_rows).reset_index(drop=True))
+
+
+# Model inputs as logreg.py prepares them
+def model_frame(cleaned):
+    data = cleaned[feature_cols + ["Delivery Method"]].copy()
+    for col, mapping in factor_mappings.items():
+        if col in data.columns:
+            data[col] = pd.Categorical(data[col].map(mapping))
+    data = data.dropna()
+    y = (data.pop("Delivery Method") == "VBAC").astype(int)
+    return data, y
+
+
+# Run fn `repeat` times and summarize the wall-clock seconds
+def measure(fn, repeat, units=None):
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    result = {"runs": repeat, "min_s": min(seconds), "median_s": statistics.median(seconds),
+              "mean_s": statistics.fmean(seconds)}
+    if units:
+        result["units"] = units
+        result["per_second"] = units / result["median_s"]
+    return result
+
+
+def bench_fwf_parse(work_dir, args, state):
+    path = write_synthetic_fwf(os.path.join(work_dir, "Nat2021.txt"), args.records, args.seed)
+    result = measure(lambda: state.update(parsed=read_natality_file(path)[0]), args.repeat, args.records)
+    result["cohort_rows"] = len(state["parsed"])
+    return result
+
+
+def bench_filter(work_dir, args, state):
+    if "parsed" not in state:
+        block = synthetic_block(args.records, args.seed)
+        state["parsed"] = parse_block(block[cohort_mask(block)])
+    return measure(lambda: sentinel_filter(state["parsed"]), args.repeat, len(state["parsed"]))
+
+
+# Runs make_combined_csv.py from scratch over synthetic per-year CSVs (includes interpreter startup)
+def bench_combine(work_dir, args, state):
+    csv_dir = os.path.join(work_dir, "csv_files")
+    os.makedirs(csv_dir, exist_ok=True)
+    per_year = max(args.rows // len(years), 1)
+    for i, year in enumerate(years):
+        synthetic_cleaned_frame(per_year, args.seed + i, year).to_csv(os.path.join(csv_dir, f"natality_{year}.csv"), index=False)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "make_combined_csv.py")
+    command = [sys.executable, script, "--input-dir", csv_dir, "--force"]
+    return measure(lambda: subprocess.run(command, cwd=work_dir, check=True, stdout=subprocess.DEVNULL),
+                   args.repeat, per_year * len(years))
+
+
+def bench_encode_get_dummies(work_dir, args, state):
+    X, _ = state["model_frame"]
+    return measure(lambda: pd.get_dummies(X, columns=categorical_features, drop_first=True), args.repeat, len(X))
+
+
+def bench_encode_feature_encoder(work_dir, args, state):
+    X, _ = state["model_frame"]
+    encoder = FeatureEncoder(numeric_features, binary_features, categorical_features)
+    result = measure(lambda: state.update(X=encoder.fit(X).transform(X)), args.repeat, len(X))
+    state["encoder"] = encoder
+    return result
+
+
+# Compact design matrix; reports its size against the dense float64 matrix
+def bench_encode_design_matrix(work_dir, args, state):
+    X, _ = state["model_frame"]
+    encoder = FeatureEncoder(numeric_features, binary_features, categorical_features).fit(X)
+    result = measure(lambda: state.update(design_matrix=build_design_matrix(encoder, X)), args.repeat, len(X))
+    result["dense_bytes"] = len(X) * len(encoder.feature_names) * 8
+    result["compact_bytes"] = state["design_matrix"].nbytes
+    return result
+
+
+def bench_lr_fit(work_dir, args, state):
+    X, y = state["X"], state["model_frame"][1]
+    model = LogisticRegression(max_iter=1000, solver="liblinear")
+    return measure(lambda: model.fit(X, y), args.repeat, len(X))
+
+
+# As logreg.py fits it: liblinear on the sparse matrix built from the design matrix
+def bench_lr_fit_sparse(work_dir, args, state):
+    X, y = state["design_matrix"].tocsr(), state["model_frame"][1]
+    model = LogisticRegression(max_iter=1000, solver="liblinear")
+    return measure(lambda: model.fit(X, y), args.repeat, X.shape[0])
+
+
+# Same network and training settings as MLP.py, timed per epoch
+def bench_mlp_epoch(work_dir, args, state):
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return {"skipped": "tensorflow is not installed"}
+    from MLP import build_model
+
+    X = state["X"].to_numpy(dtype=np.float32)
+    X = (X - X.mean(axis=0)) / np.where(X.std(axis=0) > 0, X.std(axis=0), 1)
+    y = state["model_frame"][1].to_numpy()
+    model = build_model(X.shape[1])
+
+    epoch_seconds = []
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.started = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            epoch_seconds.append(time.perf_counter() - self.started)
+
+    model.fit(X, y, epochs=args.mlp_epochs + 1, batch_size=256, callbacks=[EpochTimer()], verbose=0)
+    # The first epoch includes graph tracing; report it separately
+    steady = epoch_seconds[1:]
+    return {"runs": len(steady), "first_epoch_s": epoch_seconds[0], "min_s": min(steady),
+            "median_s": statistics.median(steady), "mean_s": statistics.fmean(steady),
+            "units": len(X), "per_second": len(X) / statistics.median(steady)}
+
+
+# Single-row calls (as in /predict) against one call for a whole batch, for the
+# sklearn model and the NumPy scorer served by predict.py; per_second is rows/s
+def predict_models(state):
+    lr = state["lr"]
+    return {"sklearn": lr, "numpy": LogisticScorer(lr.coef_[0], lr.intercept_[0])}
+
+
+def bench_predict_single(work_dir, args, state):
+    X = state["X"].to_numpy()[:args.single_rows]
+    results = {}
+    for name, model in predict_models(state).items():
+        results[name] = measure(lambda: [model.predict_proba(row[np.newaxis]) for row in X], args.repeat, len(X))
+    return results
+
+
+def bench_predict_batch(work_dir, args, state):
+    X = state["X"].to_numpy()
+    return {name: measure(lambda: model.predict_proba(X), args.repeat, len(X))
+            for name, model in predict_models(state).items()}
+
+
+# load_model() of the logistic scorer and of an MLP scorer the size of MLP.py's
+# network (random weights), from the JSON scorer file and from the mapped bundle
+def bench_model_load(work_dir, args, state):
+    encoder = state["encoder"]
+    n_features = len(encoder.feature_names)
+    rng = np.random.default_rng(args.seed)
+    sizes = [n_features, 128, 64, 32, 1]
+    scorers = {
+        "logistic": {"model_type": "logistic_regression", "feature_names": encoder.feature_names,
+                     "coef": state["lr"].coef_[0].tolist(), "intercept": float(state["lr"].intercept_[0]),
+                     "encoder": encoder.to_dict()},
+        "mlp": {"model_type": "mlp", "feature_names": encoder.feature_names,
+                "mean": np.zeros(n_features).tolist(), "scale": np.ones(n_features).tolist(),
+                "layers": [{"weights": rng.normal(0, 0.1, (n_in, n_out)).tolist(), "bias": np.zeros(n_out).tolist(),
+                            "activation": "sigmoid" if n_out == 1 else "leaky_relu", "negative_slope": 0.3}
+                           for n_in, n_out in zip(sizes, sizes[1:])],
+                "encoder": encoder.to_dict()}
+    }
+    results = {}
+    for name, scorer_data in scorers.items():
+        for ext in ("json", "bundle"):
+            path = write_scorer_file(scorer_data, os.path.join(work_dir, f"{name}.{ext}"))
+            results[f"{name}_{ext}"] = measure(lambda: load_model(path), args.repeat)
+            results[f"{name}_{ext}"]["file_bytes"] = os.path.getsize(path)
+    return results
+
+
+# Cold start of the prediction server: a fresh interpreter importing predict.py
+# (which loads the model), as a gunicorn master on a new pod does. Also reports
+# which training libraries that import pulled in; there should be none.
+def bench_serve_startup(work_dir, args, state):
+    model_path = export_scorer(state["lr"], list(state["X"].columns), state["encoder"],
+                               os.path.join(work_dir, "serve_model.bundle"))
+    code = f"import sys, predict; print(','.join(m for m in {TRAINING_MODULES!r} if m in sys.modules))"
+    command = [sys.executable, "-c", code]
+    env = dict(os.environ, MODEL_PATH=model_path, LOG_LEVEL="WARNING")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    run = lambda: subprocess.run(command, cwd=script_dir, env=env, check=True, capture_output=True, text=True)
+    result = measure(run, args.repeat)
+    result["training_modules"] = [m for m in run().stdout.strip().split(",") if m]
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__, "commit": commit}
+
+
+def flatten(results):
+    for stage, result in results.items():
+        if "median_s" in result:
+            yield stage, result
+        else:
+            for name, sub in result.items():
+                if isinstance(sub, dict) and "median_s" in sub:
+                    yield f"{stage}.{name}", sub
+
+
+# Print median times against an earlier results file
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = dict(flatten(json.load(f)["stages"]))
+    print(f"\nCompared with {previous_path}:")
+    print(f"{'stage':<32}{'before (s)':>12}{'now (s)':>12}{'speedup':>10}")
+    for stage, result in flatten(results):
+        if stage in previous:
+            before, now = previous[stage]["median_s"], result["median_s"]
+            print(f"{stage:<32}{before:>12.4f}{now:>12.4f}{before / now:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the ingest, encoding, training and inference stages on synthetic data.")
+    parser.add_argument("--records", type=int, default=50_000, help="Records in the synthetic fixed-width file")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic cleaned dataset")
+    parser.add_argument("--single-rows", type=int, default=1000, help="Rows scored one at a time in predict_single")
+    parser.add_argument("--mlp-epochs", type=int, default=3, help="Timed Keras epochs (after one warm-up epoch)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run")
+    parser.add_argument("--output-dir", default="benchmark_results", help="Where result files are written")
+    parser.add_argument("--compare", help="Earlier results file to compare with (default: the latest in --output-dir)")
+    args = parser.parse_args()
+
+    previous = args.compare or max(glob.glob(os.path.join(args.output_dir, "benchmark_*.json")), default=None)
+    results = {}
+    state = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Later stages use the encoded matrix and the fitted model, also when their own stages are not run
+        X, y = state["model_frame"] = model_frame(synthetic_cleaned_frame(args.rows, args.seed))
+        encoder = state["encoder"] = FeatureEncoder().fit(X)
+        state["X"] = encoder.transform(X)
+        state["design_matrix"] = build_design_matrix(encoder, X)
+        state["lr"] = LogisticRegression(max_iter=1000, solver="liblinear").fit(state["X"].to_numpy(), y)
+        for stage in STAGES:
+            if stage in args.stages:
+                print(f"⏱️ {stage}...", file=sys.stderr)
+                results[stage] = globals()[f"bench_{stage}"](work_dir, args, state)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {"records": args.records, "rows": args.rows, "single_rows": args.single_rows,
+                   "mlp_epochs": args.mlp_epochs, "repeat": args.repeat, "seed": args.seed},
+        "stages": results
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'stage':<32}{'median (s)':>12}{'units/s':>14}")
+    for stage, result in flatten(results):
+        print(f"{stage:<32}{result['median_s']:>12.4f}{result.get('per_second', float('nan')):>14,.0f}")
+    for stage, result in results.items():
+        if "skipped" in result:
+            print(f"{stage:<32}skipped: {result['skipped']}")
+    print(f"\n✅ Results saved to {output_path}")
+    if previous:
+        compare(results, previous)
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from features import binary_true_values
+
+# Compact storage for an encoded training frame. FeatureEncoder.transform()
+# returns one dense float64 column per feature, most of them 0/1 indicators;
+# here each numeric feature is kept as the smallest integer type that holds
+# it exactly, in tenths or hundredths if need be (BMI is recorded to one
+# decimal), or float32 otherwise, and the flag and one-hot columns are a
+# single CSR block that only stores the ones. Columns are in
+# encoder.feature_names order: numeric first, then the indicators.
+
+
+# (values, scale) with values / scale equal to the input
+def compact_column(values, max_decimals=2):
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    if np.isfinite(values).all():
+        for decimals in range(max_decimals + 1):
+            scale = 10 ** decimals
+            scaled = np.round(values * scale)
+            if not np.array_equal(scaled / scale, values):
+                continue
+            for dtype in (np.int8, np.int16, np.int32):
+                info = np.iinfo(dtype)
+                if not len(values) or (scaled.min() >= info.min and scaled.max() <= info.max):
+                    return scaled.astype(dtype), scale
+            break
+    return values.astype(np.float32), 1
+
+
+class DesignMatrix:
+    def __init__(self, feature_names, numeric, scales, indicators):
+        self.feature_names = list(feature_names)
+        self.numeric = list(numeric)  # One 1-D array per numeric feature...
+        self.scales = list(scales)  # ...holding the value times its scale
+        self.indicators = indicators  # CSR float32, one column per flag or one-hot level
+
+    @property
+    def shape(self):
+        return self.indicators.shape[0], len(self.feature_names)
+
+    def __len__(self):
+        return self.indicators.shape[0]
+
+    @property
+    def nbytes(self):
+        return (sum(col.nbytes for col in self.numeric) + self.indicators.data.nbytes
+                + self.indicators.indices.nbytes + self.indicators.indptr.nbytes)
+
+    # Row subset, e.g. a train/test split from train_test_split on np.arange(len(X))
+    def take(self, rows):
+        return DesignMatrix(self.feature_names, [col[rows] for col in self.numeric], self.scales, self.indicators[rows])
+
+    def numeric_column(self, i, dtype=np.float64, rows=slice(None)):
+        col = self.numeric[i][rows].astype(dtype)
+        return col / self.scales[i] if self.scales[i] != 1 else col
+
+    # Keep only the named columns, in their current order
+    def select(self, feature_names):
+        keep = set(feature_names)
+        n_numeric = len(self.numeric)
+        numeric = [i for i, name in enumerate(self.feature_names[:n_numeric]) if name in keep]
+        indicators = [i for i, name in enumerate(self.feature_names[n_numeric:]) if name in keep]
+        names = [self.feature_names[i] for i in numeric] + [self.feature_names[n_numeric + i] for i in indicators]
+        return DesignMatrix(names, [self.numeric[i] for i in numeric], [self.scales[i] for i in numeric],
+                            self.indicators[:, indicators].tocsr())
+
+    # Sparse input for the scikit-learn solvers (liblinear needs float64)
+    def tocsr(self, dtype=np.float64):
+        numeric = sp.csr_matrix(np.column_stack([self.numeric_column(i, dtype) for i in range(len(self.numeric))])) \
+            if self.numeric else None
+        blocks = [block for block in (numeric, self.indicators.astype(dtype)) if block is not None]
+        return sp.hstack(blocks, format="csr", dtype=dtype)
+
+    def toarray(self, dtype=np.float32, rows=None):
+        rows = slice(None) if rows is None else rows
+        indicators = self.indicators[rows]
+        out = np.empty((indicators.shape[0], len(self.feature_names)), dtype=dtype)
+        for i in range(len(self.numeric)):
+            out[:, i] = self.numeric_column(i, dtype, rows)
+        out[:, len(self.numeric):] = indicators.toarray()
+        return out
+
+    # Column means and standard deviations (NaN ignored, as StandardScaler); a
+    # zero standard deviation is returned as 1 so the column scales to 0
+    def column_stats(self):
+        n = len(self)
+        numeric = [self.numeric_column(i) for i in range(len(self.numeric))]
+        numeric_mean = [np.nanmean(col) for col in numeric]
+        numeric_std = [np.nanstd(col) for col in numeric]
+        p = np.asarray(self.indicators.sum(axis=0), dtype=np.float64).ravel() / max(n, 1)
+        mean = np.concatenate([numeric_mean, p])
+        std = np.concatenate([numeric_std, np.sqrt(p * (1 - p))])
+        return mean, np.where(std > 0, std, 1.0)
+
+    # Columns with a single value (NaN counting as a value, as nunique() == 1 on a filled frame)
+    def constant_columns(self):
+        n_numeric = len(self.numeric)
+        constant = [self.feature_names[i] for i, col in enumerate(self.numeric) if len(np.unique(col)) <= 1]
+        counts = np.diff(self.indicators.tocsc().indptr)
+        constant += [self.feature_names[n_numeric + i] for i in np.flatnonzero((counts == 0) | (counts == len(self)))]
+        return constant
+
+    # Pearson correlation of every pair of columns, accumulated over blocks of
+    # rows from the centered numeric columns and the sparse indicators (rows
+    # with a missing numeric value are skipped)
+    def correlation(self, block_rows=100_000):
+        n_numeric = len(self.numeric)
+        complete = np.ones(len(self), dtype=bool)
+        for i in range(n_numeric):
+            complete &= ~np.isnan(self.numeric_column(i))
+        X = self.take(np.flatnonzero(complete)) if not complete.all() else self
+        n = max(len(X), 1)
+        numeric_mean = [X.numeric_column(i).mean() if len(X) else 0.0 for i in range(n_numeric)]
+        p = np.asarray(X.indicators.sum(axis=0), dtype=np.float64).ravel() / n
+        cov = np.zeros((len(self.feature_names), len(self.feature_names)))
+        for start in range(0, len(X), block_rows):
+            rows = slice(start, start + block_rows)
+            indicators = X.indicators[rows].astype(np.float64)
+            numeric = np.empty((indicators.shape[0], n_numeric))
+            for i in range(n_numeric):
+                numeric[:, i] = X.numeric_column(i, rows=rows) - numeric_mean[i]
+            cov[:n_numeric, :n_numeric] += numeric.T @ numeric
+            cov[:n_numeric, n_numeric:] += (indicators.T @ numeric).T
+            cov[n_numeric:, n_numeric:] += (indicators.T @ indicators).toarray()
+        cov /= n
+        cov[n_numeric:, n_numeric:] -= np.outer(p, p)
+        cov[n_numeric:, :n_numeric] = cov[:n_numeric, n_numeric:].T
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        return pd.DataFrame(corr, index=self.feature_names, columns=self.feature_names)
+
+    # Standardized dense float32 batches of (x, y), for Keras
+    def batches(self, y, batch_size=256, mean=None, scale=None, shuffle=False, seed=None):
+        y = np.asarray(y, dtype=np.float32)
+        rows = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            x = self.toarray(rows=batch)
+            if mean is not None:
+                x = ((x - mean) / scale).astype(np.float32)
+            yield x, y[batch]
+
+
+# Encode a frame with a fitted FeatureEncoder into a DesignMatrix. Same values
+# as encoder.transform(data), without materializing the dense matrix.
+def build_design_matrix(encoder, data):
+    columns = [compact_column(data[col]) for col, _ in encoder._numeric_index]
+    numeric, scales = [values for values, _ in columns], [scale for _, scale in columns]
+    n_numeric = len(numeric)
+    rows, cols = [], []
+    for col, i in encoder._binary_index:
+        hits = np.flatnonzero(data[col].isin(binary_true_values).to_numpy())
+        rows.append(hits)
+        cols.append(np.full(len(hits), i - n_numeric))
+    index = {name: i - n_numeric for i, name in enumerate(encoder.feature_names)}
+    for col in encoder.categorical_cols:
+        levels = encoder.levels[col]
+        codes = pd.Categorical(data[col], categories=levels).codes
+        columns = np.array([index.get(f"{col}_{level}", -1) for level in levels] + [-1])
+        target = columns[codes]  # code -1 (missing/unseen) lands on the trailing -1
+        hits = np.flatnonzero(target >= 0)
+        rows.append(hits)
+        cols.append(target[hits])
+    rows = np.concatenate(rows) if rows else np.array([], dtype=int)
+    cols = np.concatenate(cols) if cols else np.array([], dtype=int)
+    shape = (len(data), len(encoder.feature_names) - n_numeric)
+    indicators = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+    return DesignMatrix(encoder.feature_names, numeric, scales, indicators)
@@ -0,0 +1,247 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+
+# Test-set evaluation for logreg.py and MLP.py, written to files so training
+# runs unattended: a JSON report and PNG figures rendered without a display.
+#
+# Every metric is computed from the number of positive and negative rows at
+# each distinct predicted probability, so the AUROC of a bootstrap resample
+# is a multinomial draw over those counts followed by a cumulative sum, and a
+# whole batch of resamples is one array operation. The overall population and
+# each subgroup are evaluated in parallel across processes.
+
+# Columns the test rows are broken down by, when present
+SUBGROUP_COLS = ["Mother's Race/Hispanic", "Payment", "Birth Year"]
+
+# Upper bound on the resampled counts held in memory at once (per process)
+BOOTSTRAP_CELLS = 4_000_000
+
+
+# Distinct probabilities in ascending order, with the negative and positive rows at each
+def score_counts(y, p):
+    scores, inverse = np.unique(p, return_inverse=True)
+    y = np.asarray(y) == 1
+    negatives = np.bincount(inverse[~y], minlength=len(scores)).astype(np.float64)
+    positives = np.bincount(inverse[y], minlength=len(scores)).astype(np.float64)
+    return scores, negatives, positives
+
+
+# AUROC from counts over ascending scores (ties count one half); the last axis
+# runs over scores, so a (resamples, scores) pair of arrays gives one AUROC per resample
+def auc_from_counts(negatives, positives):
+    below = np.cumsum(negatives, axis=-1) - negatives
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sum(positives * (below + 0.5 * negatives), axis=-1) / (positives.sum(axis=-1) * negatives.sum(axis=-1))
+
+
+# AUROC of n_bootstrap resamples of the rows, drawn in batches of at most BOOTSTRAP_CELLS counts
+def bootstrap_auc(negatives, positives, n_bootstrap, rng):
+    cells = np.concatenate([negatives, positives])
+    n = int(cells.sum())
+    batch = max(BOOTSTRAP_CELLS // len(cells), 1)
+    aucs = []
+    for start in range(0, n_bootstrap, batch):
+        draws = rng.multinomial(n, cells / n, size=min(batch, n_bootstrap - start))
+        aucs.append(auc_from_counts(draws[:, :len(negatives)], draws[:, len(negatives):]))
+    return np.concatenate(aucs) if aucs else np.array([])
+
+
+# Reliability table: mean predicted probability and observed rate per probability bin
+def calibration_table(y, p, bins=10):
+    index = np.minimum((p * bins).astype(int), bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    predicted = np.bincount(index, weights=p, minlength=bins)
+    observed = np.bincount(index, weights=y, minlength=bins)
+    return [{"bin_low": b / bins, "bin_high": (b + 1) / bins, "n": int(counts[b]),
+             "mean_predicted": predicted[b] / counts[b], "observed_rate": observed[b] / counts[b]}
+            for b in np.flatnonzero(counts)]
+
+
+# ROC curve points (false and true positive rates, from the highest threshold down)
+def roc_points(y, p):
+    _, negatives, positives = score_counts(y, p)
+    fpr = np.concatenate([[0], np.cumsum(negatives[::-1])]) / max(negatives.sum(), 1)
+    tpr = np.concatenate([[0], np.cumsum(positives[::-1])]) / max(positives.sum(), 1)
+    return fpr, tpr
+
+
+# All metrics for one set of rows. Runs in a worker process; seed makes the
+# resamples independent of which worker runs it.
+def population_metrics(y, p, n_bootstrap=1000, confidence=0.95, bins=10, seed=0):
+    y = np.asarray(y, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    _, negatives, positives = score_counts(y, p)
+    calibration = calibration_table(y, p, bins)
+    result = {
+        "n": len(y),
+        "positives": int(positives.sum()),
+        "observed_rate": float(y.mean()) if len(y) else float("nan"),
+        "mean_predicted": float(p.mean()) if len(y) else float("nan"),
+        "auroc": float(auc_from_counts(negatives, positives)) if len(y) else float("nan"),
+        "auroc_ci": [float("nan"), float("nan")],
+        "brier": float(np.mean((p - y) ** 2)) if len(y) else float("nan"),
+        "calibration_error": sum(row["n"] * abs(row["observed_rate"] - row["mean_predicted"])
+                                 for row in calibration) / max(len(y), 1),
+        "calibration": calibration
+    }
+    if n_bootstrap and positives.sum() and negatives.sum():
+        aucs = bootstrap_auc(negatives, positives, n_bootstrap, np.random.default_rng(seed))
+        tail = (1 - confidence) / 2 * 100
+        result["auroc_ci"] = [float(v) for v in np.nanpercentile(aucs, [tail, 100 - tail])]
+    return result
+
+
+# Plain label for a group value (2021 rather than 2021.0)
+def group_label(value):
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# NaN is not valid JSON; write it as null
+def json_safe(value):
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [json_safe(v) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def format_ci(metrics, confidence):
+    low, high = metrics["auroc_ci"]
+    return f"{metrics['auroc']:.4f} ({confidence:.0%} CI {low:.4f}-{high:.4f})"
+
+
+# ROC, calibration and subgroup AUROC figures (and the loss curves when a
+# Keras history is given), rendered with the file-only Agg backend
+def save_figures(report, y, p, output_dir, name, history=None):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    overall = report["overall"]
+    paths = {}
+    figures = []
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    fpr, tpr = roc_points(y, p)
+    ax.plot(fpr, tpr, label=f"AUC = {format_ci(overall, report['bootstrap']['confidence'])}")
+    ax.plot([0, 1], [0, 1], 'k--')
+    ax.set_xlabel("False Positive Rate")
+    ax.set_ylabel("True Positive Rate")
+    ax.set_title("ROC Curve")
+    ax.legend()
+    ax.grid(True)
+    paths["roc"] = os.path.join(output_dir, f"{name}_roc.png")
+    figures.append((fig, paths["roc"]))
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    table = overall["calibration"]
+    ax.plot([0, 1], [0, 1], 'k--', label="Perfect calibration")
+    ax.plot([row["mean_predicted"] for row in table], [row["observed_rate"] for row in table], "o-",
+            label=f"Brier = {overall['brier']:.4f}")
+    ax.set_xlabel("Mean Predicted Probability")
+    ax.set_ylabel("Observed VBAC Rate")
+    ax.set_title("Calibration")
+    ax.legend()
+    ax.grid(True)
+    paths["calibration"] = os.path.join(output_dir, f"{name}_calibration.png")
+    figures.append((fig, paths["calibration"]))
+
+    if report["subgroups"]:
+        fig, axes = plt.subplots(1, len(report["subgroups"]), figsize=(6 * len(report["subgroups"]), 6), squeeze=False)
+        for ax, (col, rows) in zip(axes[0], report["subgroups"].items()):
+            rows = [row for row in rows if not np.isnan(row["auroc"])]
+            auc = np.array([row["auroc"] for row in rows])
+            ci = np.array([row["auroc_ci"] for row in rows]).reshape(-1, 2)
+            ax.errorbar(auc, np.arange(len(rows)), xerr=np.abs(ci.T - auc), fmt="o", capsize=3)
+            ax.axvline(overall["auroc"], color="k", linestyle="--")
+            ax.set_yticks(np.arange(len(rows)), [f"{row['group']} (n={row['n']})" for row in rows])
+            ax.set_xlabel("AUROC")
+            ax.set_title(col)
+        paths["subgroups"] = os.path.join(output_dir, f"{name}_subgroups.png")
+        figures.append((fig, paths["subgroups"]))
+
+    if history:
+        fig, ax = plt.subplots(figsize=(8, 6))
+        ax.plot(history['loss'], label='Train Loss')
+        ax.plot(history['val_loss'], label='Val Loss')
+        ax.legend()
+        ax.set_title("Loss Over Epochs")
+        paths["loss"] = os.path.join(output_dir, f"{name}_loss.png")
+        figures.append((fig, paths["loss"]))
+
+    for fig, path in figures:
+        fig.tight_layout()
+        fig.savefig(path, dpi=100)
+        plt.close(fig)
+    return paths
+
+
+# Evaluate predicted probabilities p against outcomes y on the whole test set
+# and per value of each column of `groups` (a frame aligned with y, e.g. the
+# SUBGROUP_COLS of the test rows). Writes <name>_evaluation.json and the
+# figures to output_dir and returns the report; `extra` is stored in it as is.
+def evaluate(y, p, groups=None, name="model", output_dir="reports", n_bootstrap=1000, confidence=0.95, bins=10,
+             workers=None, seed=0, history=None, extra=None):
+    started = time.perf_counter()
+    y = np.asarray(y, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    workers = workers or os.cpu_count()
+
+    # One task for the whole test set, then one per subgroup
+    tasks = [("overall", None, np.ones(len(y), dtype=bool))]
+    if groups is not None:
+        for col in [col for col in SUBGROUP_COLS if col in groups.columns] + \
+                   [col for col in groups.columns if col not in SUBGROUP_COLS]:
+            values = groups[col].to_numpy()
+            for value in sorted(groups[col].dropna().unique(), key=group_label):
+                tasks.append((col, group_label(value), values == value))
+    args = [(y[rows], p[rows], n_bootstrap, confidence, bins, seed + i) for i, (_, _, rows) in enumerate(tasks)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(population_metrics, *zip(*args)))
+    else:
+        results = [population_metrics(*task_args) for task_args in args]
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "name": name,
+        "bootstrap": {"resamples": n_bootstrap, "confidence": confidence, "seed": seed},
+        "overall": results[0],
+        "subgroups": {}
+    }
+    for (col, label, _), result in zip(tasks[1:], results[1:]):
+        report["subgroups"].setdefault(col, []).append({"group": label, **result})
+    if extra:
+        report.update(extra)
+
+    os.makedirs(output_dir, exist_ok=True)
+    report["figures"] = save_figures(report, y, p, output_dir, name, history)
+    report["seconds"] = time.perf_counter() - started
+    report_path = os.path.join(output_dir, f"{name}_evaluation.json")
+    with open(report_path, "w") as f:
+        json.dump(json_safe(report), f, indent=2)
+    report["path"] = report_path
+    return report
+
+
+# Console summary of a report from evaluate()
+def print_report(report):
+    confidence = report["bootstrap"]["confidence"]
+    overall = report["overall"]
+    print(f"Brier score: {overall['brier']:.4f}, calibration error: {overall['calibration_error']:.4f}")
+    for col, rows in report["subgroups"].items():
+        print(f"\n[AUROC by {col}]")
+        for row in rows:
+            auc = format_ci(row, confidence) if not np.isnan(row["auroc"]) else "n/a"
+            print(f"  {row['group']:<28}n={row['n']:<8}{auc}")
+    print(f"\nEvaluation report saved to {report['path']} ({report['seconds']:.1f}s)")
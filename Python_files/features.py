@@ -0,0 +1,227 @@
+import math
+import numpy as np
+
+# pandas is only imported by the functions that take a frame, so the
+# prediction server, which only calls encode_record(), starts without it
+
+# Code-to-label mappings for the categorical natality fields
+factor_mappings = {
+    'Birth Place': {1: "Hospital", 2: "Freestanding birth center", 3: "Home (intended)",
+                    4: "Home (not)", 5: "Home (unknown)", 6: "Clinic", 7: "Other"},
+    "Mother's Race/Hispanic": {1: "White", 2: "Black", 3: "AIAN", 4: "Asian", 5: "NHOPI",
+                               6: "multirace", 7: "Hispanic"},
+    "Mother's Education": {1: "8th grade or less", 2: "9-12th grade", 3: "High school/GED",
+                           4: "College credit", 5: "Associate degree", 6: "Bachelor's",
+                           7: "Master's", 8: "Doctorate"},
+    'TOLAC Attempted (if cesarean)': {'Y': "Y", 'X': "Not applicable"},
+    'Delivery Method': {2: "VBAC", 4: "Repeat C-section"},
+    'Payment': {1: "Medicaid", 2: "Private Insurance", 3: "Self-Pay", 4: "Indian Health Service",
+                5: "CHAMPUS/TRICARE", 6: "Other Gov", 8: "Other"}
+}
+
+# Inputs of the logistic regression model
+numeric_features = [
+    "Mother's Age",
+    "Prior Births Now Living",
+    "Prior Births Now Dead",
+    "Interval Since Last Live Birth",
+    "Number of Prenatal Visits",
+    "Pre-pregnancy BMI",
+    "Weight Gain",
+    "Number of Previous Cesareans",
+    "Obstetric Estimate"
+]
+binary_features = [
+    "Pre-pregnancy Diabetes",
+    "Gestational Diabetes",
+    "Pre-pregnancy HTN",
+    "Gestational HTN",
+    "Previous Preterm Birth"
+]
+categorical_features = ["Mother's Race/Hispanic", "Mother's Education", "Payment"]
+feature_cols = numeric_features + binary_features + categorical_features
+
+# Field names and option values sent by the mobile app, mapped to the training columns and levels
+request_fields = {
+    "Mother's Race": "Mother's Race/Hispanic",
+    "Payment Method": "Payment"
+}
+request_levels = {
+    "Mother's Education": {"Associate": "Associate degree", "Bachelors": "Bachelor's",
+                           "College Credit": "College credit", "High School/GED": "High school/GED",
+                           "Masters": "Master's"}
+}
+binary_true_values = ("Y", "Yes")
+
+# Decimal places kept when canonicalizing request values; the NCHS fields are
+# whole numbers except BMI, which is recorded to one decimal
+input_precision = {"Pre-pregnancy BMI": 1}
+
+
+# A request's numeric field as a float; "NaN" and "inf" are rejected like other non-numbers
+def parse_number(col, value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{col} must be a number, got {value!r}")
+    if not math.isfinite(number):
+        raise ValueError(f"{col} must be a finite number, got {value!r}")
+    return number
+
+
+# One-hot/binary encoder shared by training and the prediction server.
+# fit() learns the categorical levels (dropping the first, like pd.get_dummies(drop_first=True)),
+# transform() encodes a training frame, and encode_record() encodes one request dict
+# through precomputed index tables.
+class FeatureEncoder:
+    def __init__(self, numeric_cols=numeric_features, binary_cols=binary_features,
+                 categorical_cols=categorical_features, levels=None, feature_names=None):
+        self.numeric_cols = list(numeric_cols)
+        self.binary_cols = list(binary_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.levels = levels or {}
+        self.feature_names = feature_names
+        if feature_names is not None:
+            self._compile()
+
+    def fit(self, data):
+        import pandas as pd
+
+        return self.fit_levels({col: pd.Categorical(data[col]).categories for col in self.categorical_cols})
+
+    # Fit from the levels seen per categorical column, e.g. collected while streaming
+    def fit_levels(self, levels):
+        for col in self.categorical_cols:
+            self.levels[col] = [str(level) for level in levels[col]]
+        self.feature_names = self.numeric_cols + self.binary_cols + [
+            f"{col}_{level}" for col in self.categorical_cols for level in self.levels[col][1:]]
+        self._compile()
+        return self
+
+    # Restrict the output to a subset of the fitted features (e.g. after dropping constant columns)
+    def select(self, feature_names):
+        self.feature_names = list(feature_names)
+        self._compile()
+        return self
+
+    def _compile(self):
+        index = {name: i for i, name in enumerate(self.feature_names)}
+        self._numeric_index = [(col, index[col]) for col in self.numeric_cols if col in index]
+        self._binary_index = [(col, index[col]) for col in self.binary_cols if col in index]
+        self._level_index = {}
+        for col in self.categorical_cols:
+            table = {level: index[f"{col}_{level}"] for level in self.levels.get(col, [])
+                     if f"{col}_{level}" in index}
+            for alias, level in request_levels.get(col, {}).items():
+                if level in table:
+                    table[alias] = table[level]
+            self._level_index[col] = table
+        for field, col in request_fields.items():
+            if col in self._level_index:
+                self._level_index[field] = self._level_index[col]
+
+    # Encode a training frame into a float64 frame with one column per feature
+    def transform(self, data):
+        import pandas as pd
+
+        index = {name: i for i, name in enumerate(self.feature_names)}
+        X = np.zeros((len(data), len(self.feature_names)))
+        for col, i in self._numeric_index:
+            X[:, i] = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        for col, i in self._binary_index:
+            X[:, i] = data[col].isin(binary_true_values).to_numpy()
+        for col in self.categorical_cols:
+            levels = self.levels[col]
+            codes = pd.Categorical(data[col], categories=levels).codes
+            columns = np.array([index.get(f"{col}_{level}", -1) for level in levels] + [-1])
+            target = columns[codes]  # code -1 (missing/unseen) lands on the trailing -1
+            rows = np.flatnonzero(target >= 0)
+            X[rows, target[rows]] = 1
+        return pd.DataFrame(X, columns=self.feature_names, index=data.index)
+
+    # Encode one request dict into a feature vector. Missing or empty fields
+    # stay at 0; non-numeric or non-finite values for numeric fields raise ValueError.
+    def encode_record(self, record, out=None):
+        if out is None:
+            out = np.zeros(len(self.feature_names))
+        else:
+            out[:] = 0
+        for col, i in self._numeric_index:
+            value = record.get(col)
+            if value is None or value == "":
+                continue
+            out[i] = parse_number(col, value)
+        for col, i in self._binary_index:
+            if record.get(col) in binary_true_values:
+                out[i] = 1
+        for field, table in self._level_index.items():
+            value = record.get(field)
+            if value in table:
+                out[table[value]] = 1
+        return out
+
+    # Canonical form of one request dict: a tuple with the numeric fields as
+    # floats (rounded to input_precision if `rounded`), the flags as "Y" or
+    # None, and each categorical field as its training level (None when missing
+    # or unknown). Requests with the same canonical form encode to the same
+    # feature vector, so it serves as a cache key; encode_record(self.from_canonical(key))
+    # scores it. Rounding changes the model input, so it is opt-in.
+    def canonicalize(self, record, rounded=False):
+        values = []
+        for col in self.numeric_cols:
+            value = record.get(col)
+            if value is None or value == "":
+                values.append(None)
+                continue
+            value = parse_number(col, value)
+            values.append(round(value, input_precision.get(col, 0)) if rounded else value)
+        for col in self.binary_cols:
+            values.append("Y" if record.get(col) in binary_true_values else None)
+        for col in self.categorical_cols:
+            field = next((field for field, target in request_fields.items() if target == col and field in record), col)
+            value = record.get(field)
+            value = request_levels.get(col, {}).get(value, value)
+            values.append(value if value in self._level_index.get(col, {}) else None)
+        return tuple(values)
+
+    def from_canonical(self, values):
+        return dict(zip(self.numeric_cols + self.binary_cols + self.categorical_cols, values))
+
+    def to_dict(self):
+        return {
+            'numeric_cols': self.numeric_cols,
+            'binary_cols': self.binary_cols,
+            'categorical_cols': self.categorical_cols,
+            'levels': self.levels,
+            'feature_names': self.feature_names
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(**state)
+
+    # Rebuild the encoder for a model exported with only its feature names
+    @classmethod
+    def from_feature_names(cls, feature_names):
+        levels = {}
+        for col in categorical_features:
+            prefix = f"{col}_"
+            levels[col] = [name[len(prefix):] for name in feature_names if name.startswith(prefix)]
+        return cls(levels=levels, feature_names=feature_names)
+
+
+# Bring a patient frame into the training layout: request field names are
+# renamed to the training columns, and NCHS codes or mobile app option values
+# are mapped to the training labels
+def to_model_frame(data):
+    import pandas as pd
+
+    data = data.rename(columns={field: col for field, col in request_fields.items() if field in data.columns})
+    for col in categorical_features:
+        if col not in data.columns:
+            continue
+        if pd.api.types.is_numeric_dtype(data[col]):
+            data[col] = data[col].map(factor_mappings[col])
+        elif col in request_levels:
+            data[col] = data[col].replace(request_levels[col])
+    return data
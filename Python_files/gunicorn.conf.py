@@ -0,0 +1,67 @@
+# Python_files/gunicorn.conf.py
+# Production server for predict.py:
+#   gunicorn -c Python_files/gunicorn.conf.py
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Serve predict:app from this directory, so its sibling imports resolve
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "predict:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# One process per CPU, each with a few threads to absorb slow mobile
+# connections while another request is being scored
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+backlog = 2048
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+
+# Workers write their metrics here so any worker can answer GET /metrics for the whole server.
+# Without METRICS_DIR a temporary directory is created, and removed on shutdown (on_exit).
+if not os.environ.get("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="tolac-metrics-")
+    os.environ["METRICS_DIR_TEMPORARY"] = "1"
+
+# Load the model once in the master before forking, so workers share it copy-on-write
+# (a .bundle model is a read-only file mapping, shared through the page cache)
+preload_app = True
+
+# Errors only; per-request access lines are opt-in (ACCESS_LOG=-) to keep the hot path quiet
+accesslog = os.environ.get("ACCESS_LOG")
+access_log_format = '{"time": "%(t)s", "method": "%(m)s", "path": "%(U)s", "status": %(s)s, "duration_us": %(D)s}'
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+# Move everything loaded so far (the model, encoder tables, imported modules) out of the
+# garbage collector's reach, so collections in the workers do not touch and copy those pages
+def when_ready(server):
+    gc.freeze()
+
+
+# Each worker watches for newly published models and flushes its metrics
+# (threads do not survive the fork)
+def post_fork(server, worker):
+    import predict
+    predict.registry.start_watching()
+    predict.metrics.start_flushing()
+
+
+# A worker that exited no longer contributes to /metrics
+def child_exit(server, worker):
+    from metrics import snapshot_path
+    path = snapshot_path(os.environ["METRICS_DIR"], worker.pid)
+    for stale in (path, path + ".tmp"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def on_exit(server):
+    if os.environ.get("METRICS_DIR_TEMPORARY"):
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
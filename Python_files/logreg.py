@@ -1,155 +1,208 @@
-import pandas as pd
 import numpy as np
 import argparse
 import os
-import joblib
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import roc_auc_score, roc_curve
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
+from natality_io import read_natality
+from scoring import export_model
+from model_registry import publish
+from design_matrix import build_design_matrix
+from evaluation import SUBGROUP_COLS, evaluate, format_ci, print_report
+from features import FeatureEncoder, factor_mappings, feature_cols, numeric_features, binary_features, categorical_features
+
+# Training script for the logistic regression model served by predict.py. The
+# work is split into functions so other code (benchmarks, notebooks) can import
+# them; scikit-learn and statsmodels are imported by the functions that use
+# them, so importing this module or asking for --help is fast. The test set is
+# evaluated by evaluation.py, which writes a JSON report and figures to
+# --report-dir instead of opening plot windows.
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="Train and export logistic regression model.")
-parser.add_argument("csv_file", type=str, help="Path to the input CSV file")
-args = parser.parse_args()
-
-# Load data
-print("Loading data...")
-data = pd.read_csv(args.csv_file)
-print(f"Data loaded: {data.shape[0]} rows, {data.shape[1]} columns")
-
-# Factor mappings
-factor_mappings = {
-    'Birth Place': {1: "Hospital", 2: "Freestanding birth center", 3: "Home (intended)", 
-                    4: "Home (not)", 5: "Home (unknown)", 6: "Clinic", 7: "Other"},
-    "Mother's Race/Hispanic": {1: "White", 2: "Black", 3: "AIAN", 4: "Asian", 5: "NHOPI", 
-                                6: "multirace", 7: "Hispanic"},
-    "Mother's Education": {1: "8th grade or less", 2: "9-12th grade", 3: "High school/GED", 
-                            4: "College credit", 5: "Associate degree", 6: "Bachelor's", 
-                            7: "Master's", 8: "Doctorate"},
-    'TOLAC Attempted (if cesarean)': {'Y': "Y", 'X': "Not applicable"},
-    'Delivery Method': {2: "VBAC", 4: "Repeat C-section"},
-    'Payment': {1: "Medicaid", 2: "Private Insurance", 3: "Self-Pay", 4: "Indian Health Service", 
-                5: "CHAMPUS/TRICARE", 6: "Other Gov", 8: "Other"}
-}
-
-# Convert categorical columns
-for col, mapping in factor_mappings.items():
-    if col in data.columns:
-        data[col] = pd.Categorical(data[col].map(mapping))
-
-# Convert numerical columns and handle missing values
-numeric_cols = [
-    "Prior births now living", "Prior births now dead", 
-    "Number of Prenatal Visits", "Cigarettes before pregnancy",
-    "1st Tri Cigarettes", "2nd Tri Cigarettes", "3rd Tri Cigarettes",
-    "Weight gain", "Interval Since Last Live Birth"
-]
-
-for col in numeric_cols:
-    if col in data.columns:
-        # Convert to float and fill missing values with median
-        data[col] = pd.to_numeric(data[col], errors='coerce')
-        data[col] = data[col].fillna(data[col].median())
-
-# Create binary outcome variable
-data['Delivery_Method_Binary'] = (data['Delivery Method'] == "VBAC").astype(int)
-
-# Select features for the model
-feature_cols = [
-    "Mother's Age",
-    "Prior Births Now Living",
-    "Prior Births Now Dead",
-    "Interval Since Last Live Birth",
-    "Number of Prenatal Visits",
-    "Pre-pregnancy BMI",
-    "Weight Gain",
-    "Number of Previous Cesareans",
-    "Obstetric Estimate",
-    "Pre-pregnancy Diabetes",
-    "Gestational Diabetes",
-    "Pre-pregnancy HTN",
-    "Gestational HTN",
-    "Previous Preterm Birth",
-    "Mother's Race/Hispanic",
-    "Mother's Education",
-    "Payment"
-]
-
-# Create feature matrix
-X = data[feature_cols].copy()
-y = data['Delivery_Method_Binary']
-
-# Convert Yes/No columns to binary
-binary_cols = [
-    "Pre-pregnancy Diabetes",
-    "Gestational Diabetes",
-    "Pre-pregnancy HTN",
-    "Gestational HTN",
-    "Previous Preterm Birth"
-]
-
-for col in binary_cols:
-    if col in X.columns:
-        X[col] = (X[col] == 'Y').astype(int)
-
-# One-hot encode categorical variables
-categorical_cols = ["Mother's Race/Hispanic", "Mother's Education", "Payment"]
-X = pd.get_dummies(X, columns=categorical_cols, drop_first=True)
-
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-
-# Drop constant columns
-constant_cols = [col for col in X_train.columns if X_train[col].nunique() == 1]
-X_train.drop(columns=constant_cols, inplace=True)
-X_test.drop(columns=constant_cols, inplace=True)
-
-# Convert to float64 to ensure compatibility
-X_train = X_train.astype('float64')
-X_test = X_test.astype('float64')
-y_train = y_train.astype('float64')
-y_test = y_test.astype('float64')
-
-# Statsmodels summary
-print("\n[Statsmodels Summary]")
-X_train_sm = sm.add_constant(X_train)
-logit_model = sm.Logit(y_train, X_train_sm).fit()
-print(logit_model.summary())
-
-# Sklearn training for export
-print("\n[Fitting scikit-learn model for export]")
-sk_model = LogisticRegression(max_iter=1000, solver="liblinear")
-sk_model.fit(X_train, y_train)
-
-# Save model and feature names
-os.makedirs("models", exist_ok=True)
-model_data = {
-    'model': sk_model,
-    'feature_names': X_train.columns.tolist()
-}
-joblib.dump(model_data, "models/tolac_model.pkl")
-print("Model saved to models/tolac_model.pkl")
-
-# Predict and AUC
-pred_probs = sk_model.predict_proba(X_test)[:, 1]
-auc = roc_auc_score(y_test, pred_probs)
-print(f"\n[Test Set AUROC: {auc:.4f}]")
-
-# Plot ROC
-plt.figure(figsize=(8, 6))
-fpr, tpr, _ = roc_curve(y_test, pred_probs)
-plt.plot(fpr, tpr, label=f'AUC = {auc:.2f}')
-plt.plot([0, 1], [0, 1], 'k--')
-plt.xlabel("False Positive Rate")
-plt.ylabel("True Positive Rate")
-plt.title("ROC Curve")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-# Cross-validation
-cv_scores = cross_val_score(sk_model, X_train, y_train, cv=5, scoring='roc_auc')
-print(f"\nCross-validated AUROC: {np.mean(cv_scores):.4f} (+/- {np.std(cv_scores)*2:.4f})")
+parser.add_argument("csv_file", type=str,
+                    help="Path to the input CSV file, or a Parquet file/directory written by make_csv.py")
+parser.add_argument("--years", type=int, nargs="+", help="Only use these birth years")
+parser.add_argument("--publish", choices=["current", "candidate"],
+                    help="Publish the exported model to the registry served by predict.py")
+parser.add_argument("--streaming", action="store_true",
+                    help="Train out of core, streaming the data from disk in chunks (flat memory for any number of years)")
+parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per chunk with --streaming")
+parser.add_argument("--tune", action="store_true",
+                    help="Cross-validate every solver and C in parallel and export the best model")
+parser.add_argument("--cs", type=float, nargs="+", help="Values of C to search with --tune (default: 1e-3 to 100)")
+parser.add_argument("--solvers", nargs="+", help="Solvers to search with --tune (default: liblinear lbfgs newton-cholesky)")
+parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds with --tune")
+parser.add_argument("--workers", type=int, default=0,
+                    help="Worker processes with --tune and for the evaluation report (default: every CPU)")
+parser.add_argument("--leaderboard", default="models/logreg_tuning.csv", help="Where --tune writes its leaderboard")
+parser.add_argument("--summary", action="store_true",
+                    help="Also fit statsmodels' Logit and print its coefficient summary (slow on many years)")
+parser.add_argument("--report-dir", default="reports", help="Where the evaluation report and figures are written")
+parser.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap resamples for the AUROC confidence intervals")
+
+
+# Load the model features and the outcome, and encode them into a compact
+# design matrix. Returns (X, y, encoder, groups), groups holding the
+# evaluation subgroup columns.
+def load_data(path, years=None):
+    import pandas as pd
+
+    # Load data (only the model features, the outcome and the evaluation subgroups)
+    print("Loading data...")
+    group_cols = [col for col in SUBGROUP_COLS if col not in feature_cols]
+    data = read_natality(path, columns=feature_cols + group_cols + ["Delivery Method"], years=years)
+    print(f"Data loaded: {data.shape[0]} rows, {data.shape[1]} columns")
+
+    # Convert categorical columns
+    for col, mapping in factor_mappings.items():
+        if col in data.columns:
+            data[col] = pd.Categorical(data[col].map(mapping))
+
+    # Convert numerical columns and handle missing values (streaming_logreg.py
+    # fills the same columns with the same medians)
+    for col in numeric_features:
+        if col in data.columns:
+            # Convert to float and fill missing values with median
+            data[col] = pd.to_numeric(data[col], errors='coerce')
+            data[col] = data[col].fillna(data[col].median())
+
+    # Create binary outcome variable
+    data['Delivery_Method_Binary'] = (data['Delivery Method'] == "VBAC").astype(int)
+
+    # Create feature matrix
+    X = data[feature_cols].copy()
+    y = data['Delivery_Method_Binary']
+    groups = data[SUBGROUP_COLS]
+
+    # Encode Yes/No columns as binary and one-hot encode categorical variables into
+    # a compact design matrix (small-integer/float32 numeric columns, sparse indicators)
+    encoder = FeatureEncoder(numeric_features, binary_features, categorical_features).fit(X)
+    X = build_design_matrix(encoder, X)
+    print(f"Design matrix: {X.shape[0]} rows x {X.shape[1]} features, {X.nbytes / 1e6:.1f} MB")
+    return X, y, encoder, groups
+
+
+# 70/30 split, then drop the columns that are constant in the training rows
+# (also from the encoder). Returns (X_train, X_test, y_train, y_test, groups_test)
+# with float64 outcomes.
+def split_data(X, y, encoder, groups):
+    from sklearn.model_selection import train_test_split
+
+    # Split the data
+    train_rows, test_rows = train_test_split(np.arange(len(X)), test_size=0.3, random_state=42)
+    X_train, X_test = X.take(train_rows), X.take(test_rows)
+    y_train, y_test = y.iloc[train_rows], y.iloc[test_rows]
+
+    # Drop constant columns
+    constant_cols = X_train.constant_columns()
+    X_train = X_train.select([col for col in X_train.feature_names if col not in constant_cols])
+    X_test = X_test.select(X_train.feature_names)
+    encoder.select(X_train.feature_names)
+    groups_test = groups.iloc[test_rows].reset_index(drop=True)
+    return X_train, X_test, y_train.astype('float64'), y_test.astype('float64'), groups_test
+
+
+# The scikit-learn model for export, after the statsmodels summary if asked for
+def fit_model(X_train, y_train, summary=False):
+    from sklearn.linear_model import LogisticRegression
+
+    if summary:
+        import pandas as pd
+        import statsmodels.api as sm
+
+        # Statsmodels summary
+        print("\n[Statsmodels Summary]")
+        X_train_sm = sm.add_constant(pd.DataFrame(X_train.toarray(np.float64), columns=X_train.feature_names,
+                                                  index=y_train.index))
+        logit_model = sm.Logit(y_train, X_train_sm).fit()
+        print(logit_model.summary())
+
+    # Sklearn training for export
+    print("\n[Fitting scikit-learn model for export]")
+    sk_model = LogisticRegression(max_iter=1000, solver="liblinear")
+    sk_model.fit(X_train.tocsr(), y_train)
+    return sk_model
+
+
+# Cross-validated search; the best model is refitted on the training set for
+# export. Returns (model, per-fold AUROCs of the best solver and C).
+def tune_model(X_train_csr, y_train, Cs=None, solvers=None, folds=5, workers=None,
+               leaderboard_path="models/logreg_tuning.csv"):
+    from logreg_tuning import DEFAULT_CS, DEFAULT_SOLVERS, tune
+
+    print(f"\n[Tuning: {folds}-fold CV over solvers x C]")
+    leaderboard, cv_results, sk_model = tune(X_train_csr, y_train, Cs=Cs or DEFAULT_CS,
+                                             solvers=solvers or DEFAULT_SOLVERS, folds=folds, workers=workers)
+    print("\n[Leaderboard]")
+    print(leaderboard.head(10).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    os.makedirs(os.path.dirname(leaderboard_path) or ".", exist_ok=True)
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"Leaderboard saved to {leaderboard_path}")
+    print(f"Best: solver={sk_model.solver}, C={sk_model.C:.4g}")
+
+    best = leaderboard.iloc[0]
+    cv_scores = cv_results.loc[(cv_results["solver"] == best["solver"]) & (cv_results["C"] == best["C"]), "auc"]
+    return sk_model, cv_scores.to_numpy()
+
+
+# Save model, feature names and the fitted encoder, plus the coefficients-only
+# scorer file and bundle for the NumPy scorer used by predict.py, and
+# optionally publish the bundle
+def save_model(sk_model, feature_names, encoder, publish_as=None):
+    model_path, scorer_path, bundle_path = export_model(sk_model, feature_names, encoder)
+    print(f"Model saved to {model_path}")
+    print(f"Scorer saved to {scorer_path} and {bundle_path}")
+    if publish_as:
+        version = publish(bundle_path, "models", candidate=publish_as == "candidate")
+        print(f"Published as {publish_as} model version {version}")
+    return bundle_path
+
+
+# Test-set AUROC with a bootstrap confidence interval, calibration, Brier
+# score and subgroup metrics, written to report_dir
+def report_test_set(y_test, pred_probs, groups_test, report_dir="reports", n_bootstrap=1000, workers=None,
+                    extra=None):
+    report = evaluate(y_test, pred_probs, groups_test, name="logreg", output_dir=report_dir, n_bootstrap=n_bootstrap,
+                      workers=workers, extra=extra)
+    print(f"\n[Test Set AUROC: {format_ci(report['overall'], report['bootstrap']['confidence'])}]")
+    print_report(report)
+    return report
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    if args.streaming:
+        from streaming_logreg import train_streaming
+
+        sk_model, encoder, (y_test, pred_probs, groups_test) = train_streaming(
+            args.csv_file, years=args.years, chunk_rows=args.chunk_rows, group_cols=SUBGROUP_COLS)
+        save_model(sk_model, encoder.feature_names, encoder, args.publish)
+        report_test_set(y_test, pred_probs, groups_test, args.report_dir, args.bootstrap, args.workers or None)
+        return sk_model
+
+    X, y, encoder, groups = load_data(args.csv_file, args.years)
+    X_train, X_test, y_train, y_test, groups_test = split_data(X, y, encoder, groups)
+    del X, groups
+
+    # The scikit-learn solvers take the sparse float64 matrices
+    X_train_csr = X_train.tocsr()
+    X_test_csr = X_test.tocsr()
+
+    extra = {}
+    if args.tune:
+        sk_model, cv_scores = tune_model(X_train_csr, y_train, args.cs, args.solvers, args.folds,
+                                         args.workers or None, args.leaderboard)
+        # The search already cross-validated the chosen solver and C
+        print(f"\nCross-validated AUROC: {np.mean(cv_scores):.4f} (+/- {np.std(cv_scores)*2:.4f})")
+        extra["cv_auroc"] = {"solver": sk_model.solver, "C": sk_model.C, "folds": cv_scores.tolist()}
+    else:
+        sk_model = fit_model(X_train, y_train, args.summary)
+    save_model(sk_model, X_train.feature_names, encoder, args.publish)
+
+    # Predict and evaluate
+    pred_probs = sk_model.predict_proba(X_test_csr)[:, 1]
+    report_test_set(y_test, pred_probs, groups_test, args.report_dir, args.bootstrap, args.workers or None, extra)
+    return sk_model
+
+
+if __name__ == "__main__":
+    main()
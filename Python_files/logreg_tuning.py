@@ -0,0 +1,108 @@
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+# Cross-validated search over solvers x regularization strengths for the
+# logreg.py model. One task fits one (solver, fold) pair along the whole C
+# path, from the strongest regularization to the weakest, starting every fit
+# from the previous coefficients. The training matrix is saved once and
+# memory-mapped read-only by every worker; folds are selected with sample
+# weights (0 for the held-out rows) instead of copying the training rows.
+# X may be dense or a CSR matrix (DesignMatrix.tocsr()); a CSR matrix is saved
+# as its data/indices/indptr arrays and mapped the same way.
+
+DEFAULT_CS = [float(c) for c in np.logspace(-3, 2, 11)]
+DEFAULT_SOLVERS = ["liblinear", "lbfgs", "newton-cholesky"]
+
+# liblinear ignores warm_start, so each of its fits starts from zero
+WARM_START_SOLVERS = {"lbfgs", "newton-cg", "newton-cholesky", "sag", "saga"}
+
+
+def save_matrix(X, directory):
+    if sp.issparse(X):
+        X = sp.csr_matrix(X, dtype=np.float64)
+        paths = {}
+        for part in ("data", "indices", "indptr"):
+            paths[part] = os.path.join(directory, f"X_{part}.npy")
+            np.save(paths[part], getattr(X, part))
+        return {"paths": paths, "shape": X.shape}
+    path = os.path.join(directory, "X.npy")
+    np.save(path, np.ascontiguousarray(X, dtype=np.float64))
+    return {"path": path}
+
+
+def load_matrix(spec):
+    if "paths" in spec:
+        parts = {part: np.load(path, mmap_mode="r") for part, path in spec["paths"].items()}
+        return sp.csr_matrix((parts["data"], parts["indices"], parts["indptr"]), shape=spec["shape"], copy=False)
+    return np.load(spec["path"], mmap_mode="r")
+
+
+def fit_path(X_spec, y_path, solver, fold, validation, Cs, max_iter):
+    X = load_matrix(X_spec)
+    y = np.load(y_path, mmap_mode="r")
+    weights = np.ones(len(y))
+    weights[validation] = 0
+    model = LogisticRegression(solver=solver, max_iter=max_iter, warm_start=solver in WARM_START_SOLVERS)
+    rows = []
+    # One BLAS thread per worker, as the parallelism is across tasks. Fits that
+    # hit max_iter are reported in the leaderboard instead of warned about.
+    with threadpool_limits(limits=1), warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        for C in sorted(Cs):
+            model.set_params(C=C)
+            started = time.perf_counter()
+            model.fit(X, y, sample_weight=weights)
+            seconds = time.perf_counter() - started
+            scores = X @ model.coef_[0] + model.intercept_[0]
+            n_iter = int(np.max(model.n_iter_))
+            rows.append({"solver": solver, "C": C, "fold": fold, "auc": roc_auc_score(y[validation], scores[validation]),
+                         "n_iter": n_iter, "converged": n_iter < max_iter, "fit_seconds": seconds})
+    return rows
+
+
+# Returns the leaderboard (one row per solver and C, best first), the
+# per-fold results and the best model refitted on all of X, y
+def tune(X, y, Cs=DEFAULT_CS, solvers=DEFAULT_SOLVERS, folds=5, workers=None, max_iter=1000, seed=42):
+    workers = workers or os.cpu_count()
+    y_array = np.asarray(y, dtype=np.float64)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(np.zeros(len(y_array)), y_array))
+
+    started = time.perf_counter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="logreg_tuning_") as tmp:
+        X_spec, y_path = save_matrix(X, tmp), os.path.join(tmp, "y.npy")
+        np.save(y_path, y_array)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fit_path, X_spec, y_path, solver, fold, validation, Cs, max_iter)
+                       for solver in solvers for fold, (_, validation) in enumerate(splits)]
+            for future in as_completed(futures):
+                rows = future.result()
+                results.extend(rows)
+                print(f"  {rows[0]['solver']} fold {rows[0]['fold'] + 1}/{folds}: "
+                      f"{sum(row['fit_seconds'] for row in rows):.1f}s for {len(rows)} values of C")
+    print(f"Fitted {len(results)} models in {time.perf_counter() - started:.1f}s with {workers} workers")
+
+    results = pd.DataFrame(results).sort_values(["solver", "C", "fold"], ignore_index=True)
+    leaderboard = results.groupby(["solver", "C"], as_index=False).agg(
+        mean_auc=("auc", "mean"), std_auc=("auc", "std"), mean_iter=("n_iter", "mean"),
+        converged_folds=("converged", "sum"), mean_fit_seconds=("fit_seconds", "mean"))
+    # Models that converged on every fold rank above those that hit max_iter
+    leaderboard = leaderboard.sort_values(by=["converged_folds", "mean_auc", "mean_fit_seconds"],
+                                          key=lambda col: col == folds if col.name == "converged_folds" else col,
+                                          ascending=[False, False, True], ignore_index=True)
+
+    best = leaderboard.iloc[0]
+    model = LogisticRegression(solver=best["solver"], C=float(best["C"]), max_iter=max_iter)
+    model.fit(X, y)
+    return leaderboard, results, model
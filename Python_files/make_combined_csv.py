@@ -1,30 +1,85 @@
-import pandas as pd
 import os
 import glob
+import shutil
+import argparse
+from natality_io import load_manifest, save_manifest
 
-# Specify the directory containing the CSV files
-input_directory = '/Users/ananya/Desktop/TOLAC-prediction/csv_files'
 
-# Use glob to find all CSV files in the directory
-csv_files = glob.glob(os.path.join(input_directory, '*.csv'))
+def part_info(path):
+    stat = os.stat(path)
+    return {"file": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
 
-# Initialize an empty list to hold DataFrames
-dataframes = []
 
-# Loop through the list of CSV files
-for file in csv_files:
-    # Read each CSV file into a DataFrame
-    df = pd.read_csv(file)
-    # Append the DataFrame to the list
-    dataframes.append(df)
+def read_header(path):
+    with open(path, "rb") as f:
+        return f.readline()
 
-# Concatenate all DataFrames in the list into a single DataFrame
-combined_df = pd.concat(dataframes, ignore_index=True)
 
-# Specify the path for the output combined CSV file
-output_file = '/Users/ananya/Desktop/TOLAC-prediction/csv_files/combined.csv'
+# Combine the natality_{year}.csv files in input_directory, in year order, into
+# output_file (default: <input_directory>/combined.csv), only copying the years
+# that changed since the last run unless force is set
+def combine_csvs(input_directory="csv_files", output_file=None, force=False):
+    output_file = output_file or os.path.join(input_directory, 'combined.csv')
+    csv_files = sorted(glob.glob(os.path.join(input_directory, 'natality_*.csv')))
 
-# Save the combined DataFrame to a new CSV file
-combined_df.to_csv(output_file, index=False)
+    parts = [part_info(file) for file in csv_files]
+    headers = [read_header(file) for file in csv_files]
+    manifest = load_manifest()
+    state = manifest["combined"].get(os.path.abspath(output_file), {})
 
-print(f"Combined CSV file saved as {output_file}")
+    if len(set(headers)) > 1:
+        # Columns differ between years: align them with pandas
+        import pandas as pd
+
+        dataframes = [pd.read_csv(file) for file in csv_files]
+        combined_df = pd.concat(dataframes, ignore_index=True)
+        combined_df.to_csv(output_file, index=False)
+        manifest["combined"].pop(os.path.abspath(output_file), None)
+        print(f"Combined CSV file saved as {output_file}")
+    elif parts:
+        header = headers[0]
+
+        # Keep the longest run of leading years that are unchanged since the last run,
+        # provided the combined file itself has not been modified
+        kept, offset = 0, len(header)
+        old_parts = state.get("parts", [])
+        if (not force and old_parts and state.get("header") == header.decode()
+                and os.path.exists(output_file) and os.path.getsize(output_file) == old_parts[-1]["end"]):
+            while (kept < min(len(old_parts), len(parts))
+                   and {k: old_parts[kept][k] for k in ("file", "size", "mtime_ns")} == parts[kept]):
+                parts[kept]["end"] = offset = old_parts[kept]["end"]
+                kept += 1
+
+        # Replace everything after the unchanged prefix by copying the per-year files byte for byte
+        with open(output_file, "r+b" if kept else "w+b") as out:
+            out.truncate(offset if kept else 0)
+            out.seek(0, os.SEEK_END)
+            if not kept:
+                out.write(header)
+            for part in parts[kept:]:
+                with open(part["file"], "rb") as f:
+                    f.readline()  # Skip the header
+                    shutil.copyfileobj(f, out)
+                # Make sure the next year starts on a new line
+                if out.tell() > len(header):
+                    out.seek(-1, os.SEEK_END)
+                    if out.read(1) != b"\n":
+                        out.write(b"\n")
+                part["end"] = out.tell()
+                print(f"Added {os.path.basename(part['file'])}")
+
+        manifest["combined"][os.path.abspath(output_file)] = {"header": header.decode(), "parts": parts}
+        print(f"Kept {kept} unchanged year(s), added {len(parts) - kept}")
+        print(f"Combined CSV file saved as {output_file}")
+
+    save_manifest(manifest)
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine the per-year natality CSVs into one file.")
+    parser.add_argument("--input-dir", default="csv_files", help="Directory containing the natality_{year}.csv files")
+    parser.add_argument("--output-file", default=None, help="Combined CSV path (default: <input-dir>/combined.csv)")
+    parser.add_argument("--force", action="store_true", help="Rebuild the combined file from scratch")
+    args = parser.parse_args()
+    combine_csvs(args.input_dir, args.output_file, args.force)
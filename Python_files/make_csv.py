@@ -1,5 +1,14 @@
 import pandas as pd
+import numpy as np
+import argparse
+import csv
+import hashlib
+import json
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from natality_io import file_sha256, load_manifest, save_manifest
 
 # Define the years to process
 years = list(range(2017, 2024))
@@ -23,67 +32,487 @@ col_names = [
     "Obstetric Estimate"
 ]
 
+# Single-letter code columns (Y/N/U/X); every other column is a zero-padded
+# integer code except the decimal BMI field
+flag_cols = [
+    "Pre-pregnancy Diabetes", "Gestational Diabetes", "Pre-pregnancy HTN", "Gestational HTN",
+    "Previous Preterm Birth", "Previous Cesarean", "Gonorrhea", "Syphilis", "Chlamydia",
+    "Hep B", "Hep C", "TOLAC Attempted (if cesarean)"
+]
+float_cols = ["Pre-pregnancy BMI"]
+
+# Integer codes are held as int16 while filtering; blank or malformed fields become MISSING
+MISSING = -1
+
+# Records per block read from disk (~70 MB per block at the 1345-byte NCHS record length)
+DEFAULT_CHUNK_RECORDS = 50_000
+
+col_positions = dict(zip(col_names, col_specs))
+
+# Bump when the parsing or cleaning logic changes so every year is rebuilt
+BUILD_VERSION = 1
+
+# Missing/unstated sentinel codes per column, shared with R_files/Natality_createcsv.R
+sentinels_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "missing_sentinels.csv")
+
+
+# Length of one record including its line terminator
+def get_record_length(file_path):
+    with open(file_path, "rb") as f:
+        return len(f.readline())
+
+
+# Number of records in a file (the last record may be missing its line terminator)
+def count_records(file_path):
+    return -(-os.path.getsize(file_path) // get_record_length(file_path))
+
+
+# Yield (n_records, record_length) uint8 blocks of the raw file, optionally
+# restricted to the records in [start_record, stop_record)
+def iter_record_blocks(file_path, chunk_records=DEFAULT_CHUNK_RECORDS, start_record=0, stop_record=None):
+    record_length = get_record_length(file_path)
+    with open(file_path, "rb") as f:
+        f.seek(start_record * record_length)
+        position = start_record
+        while stop_record is None or position < stop_record:
+            n = chunk_records if stop_record is None else min(chunk_records, stop_record - position)
+            buf = f.read(n * record_length)
+            if not buf:
+                break
+            # The last record may be missing its line terminator
+            if len(buf) % record_length:
+                buf += b" " * (record_length - len(buf) % record_length)
+            block = np.frombuffer(buf, dtype=np.uint8).reshape(-1, record_length)
+            position += len(block)
+            yield block
+
+
+def parse_int(field):
+    digits = field.astype(np.int16) - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_blank = field == ord(" ")
+    weights = 10 ** np.arange(field.shape[1] - 1, -1, -1, dtype=np.int16)
+    values = (np.where(is_digit, digits, 0) * weights).sum(axis=1, dtype=np.int16)
+    values[~(is_digit | is_blank).all(axis=1) | is_blank.all(axis=1)] = MISSING
+    return values
+
+
+def parse_float(field):
+    # A field has few distinct values; parse each once and map blank or
+    # malformed ones to NaN instead of failing the whole block
+    text = np.ascontiguousarray(field).view(f"S{field.shape[1]}").ravel()
+    distinct, inverse = np.unique(text, return_inverse=True)
+    values = np.empty(len(distinct), dtype=np.float64)
+    for i, value in enumerate(distinct):
+        try:
+            values[i] = float(value)
+        except ValueError:
+            values[i] = np.nan
+    return values[inverse.ravel()]
+
+
+def parse_flag(field):
+    # Dictionary-encode the single byte column; blanks become NaN
+    codes = field[:, 0]
+    letters = np.unique(codes)
+    letters = letters[letters != ord(" ")]
+    lookup = np.full(256, -1, dtype=np.int8)
+    lookup[letters] = np.arange(len(letters))
+    return pd.Categorical.from_codes(lookup[codes], [chr(c) for c in letters])
+
+
+# Slice the named columns out of a record block into typed arrays
+def parse_block(block, columns=col_names):
+    parsed = {}
+    for col in columns:
+        start, end = col_positions[col]
+        field = block[:, start:end]
+        if col in flag_cols:
+            parsed[col] = parse_flag(field)
+        elif col in float_cols:
+            parsed[col] = parse_float(field)
+        else:
+            parsed[col] = parse_int(field)
+    return pd.DataFrame(parsed)
+
+
+# Singleton pregnancies with 1 or 2 previous cesareans where TOLAC is 'Y' or 'X'
+def cohort_mask(block):
+    plurality = parse_int(block[:, slice(*col_positions["Plurality"])])
+    cesareans = parse_int(block[:, slice(*col_positions["Number of Previous Cesareans"])])
+    tolac = block[:, col_positions["TOLAC Attempted (if cesarean)"][0]]
+    return (plurality == 1) & np.isin(cesareans, [1, 2]) & np.isin(tolac, [ord("Y"), ord("X")])
+
+
+# Stream a natality file block by block, keeping only the study cohort.
+# Returns the cohort frame and the total number of records read.
+def read_natality_file(file_path, chunk_records=DEFAULT_CHUNK_RECORDS, raw_output_path=None,
+                       start_record=0, stop_record=None, raw_header=True):
+    chunks = []
+    n_records = 0
+    for block in iter_record_blocks(file_path, chunk_records, start_record, stop_record):
+        if raw_output_path:
+            to_output_frame(parse_block(block)).to_csv(
+                raw_output_path, mode="a" if n_records else "w", header=raw_header and not n_records, index=False)
+        n_records += len(block)
+        mask = cohort_mask(block)
+        if mask.any():
+            chunks.append(parse_block(block[mask]))
+    if not chunks:
+        return parse_block(np.empty((0, get_record_length(file_path)), dtype=np.uint8)), n_records
+    return concat_frames(chunks), n_records
+
+
+# Concatenate parsed frames, merging the per-block flag dictionaries
+def concat_frames(frames):
+    df = pd.concat(frames, ignore_index=True)
+    for col in flag_cols:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.api.types.union_categoricals([f[col] for f in frames], sort_categories=True)
+    return df
+
+
+def load_sentinel_table(path=sentinels_path):
+    with open(path, newline="") as f:
+        return [(row["column"], row["sentinel"], row["reason"]) for row in csv.DictReader(f)]
+
+
+# Compile the sentinel table into one lookup per column. The returned function
+# takes a parsed cohort frame and returns the rows to keep plus the number of
+# rows matching each rule, in table order.
+def compile_sentinel_filter(table):
+    compiled = []
+    for col in dict.fromkeys(column for column, _, _ in table):
+        rule_ids = [i for i, rule in enumerate(table) if rule[0] == col]
+        sentinels = [table[i][1] for i in rule_ids]
+        if col in flag_cols:
+            compiled.append((col, "flag", sentinels, rule_ids))
+        elif col in float_cols:
+            compiled.append((col, "float", [float(v) for v in sentinels], rule_ids))
+        else:
+            # Integer codes index a boolean table directly; MISSING maps to slot 0
+            keys = [int(v) - MISSING for v in sentinels]
+            lookup = np.zeros(10 ** (col_positions[col][1] - col_positions[col][0]) - MISSING, dtype=bool)
+            lookup[keys] = True
+            compiled.append((col, "int", (lookup, keys), rule_ids))
+
+    def apply(df):
+        drop = np.zeros(len(df), dtype=bool)
+        counts = [0] * len(table)
+        for col, kind, sentinels, rule_ids in compiled:
+            if kind == "int":
+                lookup, keys = sentinels
+                values = df[col].to_numpy() - MISSING
+                drop |= lookup[values]
+                hits = np.bincount(values, minlength=len(lookup))[keys]
+            elif kind == "flag":
+                categories = df[col].cat.categories
+                codes = df[col].cat.codes.to_numpy()
+                matches = np.append(categories.isin(sentinels), False)  # code -1 (blank) never matches
+                drop |= matches[codes]
+                per_code = np.bincount(codes + 1, minlength=len(categories) + 1)
+                hits = [per_code[categories.get_loc(v) + 1] if v in categories else 0 for v in sentinels]
+            else:
+                values = df[col].to_numpy()
+                drop |= np.isin(values, sentinels)
+                hits = [(values == v).sum() for v in sentinels]
+            for rule_id, n in zip(rule_ids, hits):
+                counts[rule_id] = int(n)
+        return ~drop, counts
+
+    return apply
+
+
+sentinel_table = load_sentinel_table()
+sentinel_filter = compile_sentinel_filter(sentinel_table)
+
+
+# Restore blank integer fields as empty values before writing
+def to_output_frame(df):
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == np.int16:
+            values = df[col].to_numpy()
+            df[col] = pd.arrays.IntegerArray(values, values == MISSING)
+    return df
+
+
+# Compact typed frame for Parquet output: integer codes as nullable int8/int16
+# by field width, flags as string dictionaries
+def to_parquet_frame(df):
+    df = to_output_frame(df)
+    for col in df.columns:
+        if col in flag_cols:
+            df[col] = df[col].astype("category").cat.remove_unused_categories()
+        elif col not in float_cols:
+            start, end = col_positions[col]
+            df[col] = df[col].astype("Int8" if end - start <= 2 else "Int16")
+    return df
+
+
+# Filter out missing/unstated data and save the cleaned dataset for one year.
+# Returns the number of rows saved and the per-rule match counts.
+def save_year(year, filtered_df, formats=("csv",)):
+    # Debug: Check the filtered data
+    print(f"Filtered data shape (step 1): {filtered_df.shape}")
+
+    # Filter out missing/unstated data and first live births in a single pass
+    keep, rule_counts = sentinel_filter(filtered_df)
+    final_df = filtered_df[keep]
+
+    # Debug: Rows matching each rule (a row can match several)
+    for (col, sentinel, reason), n in zip(sentinel_table, rule_counts):
+        if n:
+            print(f"  {col} == {sentinel} ({reason}): {n}")
+
+    # Debug: Final shape
+    print(f"Final data shape: {final_df.shape}")
+
+    # Save the cleaned dataset
+    if "csv" in formats:
+        output_path = f"csv_files/natality_{year}.csv"
+        os.makedirs("csv_files", exist_ok=True)  # Ensure directory exists
+        to_output_frame(final_df).to_csv(output_path, index=False)
+        print(f"Processed and saved to: {output_path}")
+
+    # One Parquet file per birth year; together they form the combined dataset
+    if "parquet" in formats:
+        output_path = f"parquet_files/natality_{year}.parquet"
+        os.makedirs("parquet_files", exist_ok=True)
+        to_parquet_frame(final_df).to_parquet(output_path, index=False)
+        print(f"Processed and saved to: {output_path}")
+    return len(final_df), rule_counts
+
+
+# Worker task: read one record range of one year's file
+def read_shard(year, shard, start_record, stop_record, chunk_records, write_raw):
+    started = time.perf_counter()
+    raw_output_path = f"raw_natality_{year}.csv.part{shard}" if write_raw else None
+    filtered_df, n_records = read_natality_file(f"data/Nat{year}.txt", chunk_records, raw_output_path,
+                                                start_record, stop_record, raw_header=shard == 0)
+    return year, shard, filtered_df, n_records, time.perf_counter() - started
+
+
+# Stitch per-shard raw dumps back together in record order
+def merge_raw_parts(year, n_shards):
+    raw_output_path = f"raw_natality_{year}.csv"
+    with open(raw_output_path, "wb") as out:
+        for shard in range(n_shards):
+            part_path = f"{raw_output_path}.part{shard}"
+            if os.path.exists(part_path):
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(part_path)
+    return raw_output_path
+
+
+def print_summary(stats):
+    # Seconds are worker time spent parsing (summed over a year's record ranges in parallel mode)
+    print("\nYear  Records    Cohort  Saved   Seconds")
+    for year in sorted(stats):
+        s = stats[year]
+        print(f"{year}  {s['records']:<9}  {s['cohort']:<6}  {s['saved']:<6}  {s['seconds']:.1f}")
+
+
+# Save the rows matched by each sentinel rule per year. Counts are given as
+# [column, sentinel, n] entries and placed by rule, so a year counted under an
+# older sentinel table leaves the rules it was not counted for blank (as do
+# manifests from before counts were keyed, which stored bare numbers).
+def save_filter_report(rule_counts_by_year, path="filter_report.csv"):
+    report = pd.DataFrame(sentinel_table, columns=["column", "sentinel", "reason"])
+    for year in sorted(rule_counts_by_year):
+        counts = {(entry[0], entry[1]): entry[2] for entry in rule_counts_by_year[year] if isinstance(entry, list)}
+        report[str(year)] = pd.array([counts.get((col, sentinel)) for col, sentinel, _ in sentinel_table],
+                                     dtype="Int64")
+    report.to_csv(path, index=False)
+    print(f"Per-rule rejection counts saved to: {path}")
+
+
 # Loop through each year and process
-def process_files():
+def process_files(years=years, chunk_records=DEFAULT_CHUNK_RECORDS, write_raw=False, formats=("csv",)):
+    stats = {}
     for year in years:
         file_path = f"data/Nat{year}.txt"
         if os.path.exists(file_path):
-            # Read the fixed-width file
-            df = pd.read_fwf(file_path, colspecs=col_specs, names=col_names, dtype=str)
-            
+            started = time.perf_counter()
+            print(f"Processing year: {year}")
+
+            # Stream the fixed-width file, optionally saving raw data for inspection
+            raw_output_path = f"raw_natality_{year}.csv" if write_raw else None
+            filtered_df, n_records = read_natality_file(file_path, chunk_records, raw_output_path)
+
             # Debug: Check the loaded data
+            print(f"Initial data shape: ({n_records}, {len(col_names)})")
+            if raw_output_path:
+                print(f"Raw data saved to: {raw_output_path}")
+
+            saved, rule_counts = save_year(year, filtered_df, formats)
+            stats[year] = {"records": n_records, "cohort": len(filtered_df), "saved": saved, "rules": rule_counts,
+                           "seconds": time.perf_counter() - started}
+    print_summary(stats)
+    return stats
+
+
+# Process years in parallel: every year's file is split into record ranges
+# that are parsed by a pool of worker processes; cleaning and saving happen
+# in the parent once all ranges of a year are back
+def process_files_parallel(years=years, chunk_records=DEFAULT_CHUNK_RECORDS, write_raw=False,
+                           formats=("csv",), workers=None, shards_per_year=None):
+    workers = workers or os.cpu_count()
+    years = [year for year in years if os.path.exists(f"data/Nat{year}.txt")]
+    if not years:
+        return {}
+    shards_per_year = shards_per_year or max(1, workers // len(years))
+
+    started = time.perf_counter()
+    pending = {}
+    results = {year: {} for year in years}
+    stats = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for year in years:
+            n_records = count_records(f"data/Nat{year}.txt")
+            bounds = np.linspace(0, n_records, shards_per_year + 1).astype(int)
+            shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a] or [(0, 0)]
+            pending[year] = len(shards)
+            for shard, (start_record, stop_record) in enumerate(shards):
+                futures.append(pool.submit(read_shard, year, shard, start_record, stop_record,
+                                           chunk_records, write_raw))
+
+        for future in as_completed(futures):
+            year, shard, filtered_df, n_records, seconds = future.result()
+            results[year][shard] = (filtered_df, n_records, seconds)
+            pending[year] -= 1
+            if pending[year]:
+                continue
+
+            # All ranges of this year are parsed
+            shards = [results[year][k] for k in sorted(results[year])]
+            filtered_df = concat_frames([s[0] for s in shards])
+            n_records = sum(s[1] for s in shards)
             print(f"Processing year: {year}")
-            print(f"Initial data shape: {df.shape}")
-            
-            # Save raw data for inspection
-            raw_output_path = f"raw_natality_{year}.csv"
-            df.to_csv(raw_output_path, index=False)
-            print(f"Raw data saved to: {raw_output_path}")
-
-            # Clean and standardize the 'TOLAC Attempted (if cesarean)' column
-            if "TOLAC Attempted (if cesarean)" in df.columns:
-                df["TOLAC Attempted (if cesarean)"] = df["TOLAC Attempted (if cesarean)"].str.strip()
-
-            # Convert specific columns to numeric
-            df["Plurality"] = pd.to_numeric(df["Plurality"], errors='coerce')
-            df["Number of Previous Cesareans"] = pd.to_numeric(df["Number of Previous Cesareans"], errors='coerce')
-
-            # Filter singleton pregnancies with 1 or 2 previous cesareans where TOLAC is 'Y' or 'X'
-            filtered_df = df[(df["Plurality"] == 1) & 
-                             df["Number of Previous Cesareans"].isin([1, 2]) & 
-                             df["TOLAC Attempted (if cesarean)"].isin(["Y", "X"])]
-
-            # Debug: Check the filtered data
-            print(f"Filtered data shape (step 1): {filtered_df.shape}")
-
-            # Filter out missing/unstated data
-            final_df = filtered_df[(filtered_df["Birth Place"] != "9") & (filtered_df["Mother's Race/Hispanic"] != "8") &
-                                   (filtered_df["Mother's Education"] != "9") & (filtered_df["Prior Births Now Living"] != "99") &
-                                   (filtered_df["Prior Births Now Dead"] != "99") & (filtered_df["Interval Since Last Live Birth"] != "999") &
-                                   (filtered_df["Number of Prenatal Visits"] != "99") & (filtered_df["Cigarettes Before Pregnancy"] != "99") &
-                                   (filtered_df["1st Tri Cigarettes"] != "99") & (filtered_df["2nd Tri Cigarettes"] != "99") &
-                                   (filtered_df["3rd Tri Cigarettes"] != "99") & (filtered_df["Pre-pregnancy BMI"] != "99.9") &
-                                   (filtered_df["Weight Gain"] != "99") & (filtered_df["Pre-pregnancy Diabetes"] != "U") &
-                                   (filtered_df["Gestational Diabetes"] != "U") & (filtered_df["Pre-pregnancy HTN"] != "U") &
-                                   (filtered_df["Gestational HTN"] != "U") & (filtered_df["Previous Preterm Birth"] != "U") &
-                                   (filtered_df["Gonorrhea"] != "U") & (filtered_df["Syphilis"] != "U") &
-                                   (filtered_df["Chlamydia"] != "U") & (filtered_df["Hep B"] != "U") & (filtered_df["Hep C"] != "U") &
-                                   (filtered_df["Payment"] != "9") & (filtered_df["Obstetric Estimate"] != "99")]
-
-            # Debug: Check the filtered data after removing missing values
-            print(f"Filtered data shape (step 2): {final_df.shape}")
-
-            # Filter for first live birth or not applicable interval since last birth
-            final_df = final_df[final_df["Interval Since Last Live Birth"] != "888"]
-
-            # Debug: Final shape
-            print(f"Final data shape: {final_df.shape}")
-
-            # Save the cleaned dataset
-            output_path = f"csv_files/natality_{year}.csv"
-            os.makedirs("csv_files", exist_ok=True)  # Ensure directory exists
-            final_df.to_csv(output_path, index=False)
-            print(f"Processed and saved to: {output_path}")
-
-# Run the processing
-process_files()
+            print(f"Initial data shape: ({n_records}, {len(col_names)})")
+            if write_raw:
+                print(f"Raw data saved to: {merge_raw_parts(year, len(shards))}")
+            saved, rule_counts = save_year(year, filtered_df, formats)
+            stats[year] = {"records": n_records, "cohort": len(filtered_df), "saved": saved, "rules": rule_counts,
+                           "seconds": sum(s[2] for s in shards)}
+            del results[year]
+
+    print_summary(stats)
+    print(f"Total wall time: {time.perf_counter() - started:.1f}s with {workers} workers")
+    return stats
+
+
+# Fingerprint of everything that shapes a cleaned year besides its input file
+def spec_version():
+    spec = json.dumps([BUILD_VERSION, col_specs, col_names, flag_cols, float_cols, sentinel_table])
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+def output_paths(year, formats, write_raw=False):
+    paths = []
+    if "csv" in formats:
+        paths.append(f"csv_files/natality_{year}.csv")
+    if "parquet" in formats:
+        paths.append(f"parquet_files/natality_{year}.parquet")
+    if write_raw:
+        paths.append(f"raw_natality_{year}.csv")
+    return paths
+
+
+# Years whose outputs are missing or were built from a different input file or
+# spec. Inputs are only re-hashed when their size or mtime changed.
+# Returns the stale years and the input hashes computed along the way.
+def find_stale_years(years, formats, manifest, write_raw=False):
+    version = spec_version()
+    stale, hashes = [], {}
+    for year in years:
+        file_path = f"data/Nat{year}.txt"
+        if not os.path.exists(file_path):
+            continue
+        entry = manifest["years"].get(str(year))
+        if (entry is None or entry["spec_version"] != version
+                or not set(formats) <= set(entry.get("formats", []))
+                or not all(os.path.exists(p) for p in output_paths(year, formats, write_raw))):
+            stale.append(year)
+            continue
+        stat = os.stat(file_path)
+        if (entry["input_size"], entry["input_mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            continue
+        hashes[year] = file_sha256(file_path)
+        if hashes[year] != entry["input_sha256"]:
+            stale.append(year)
+        else:
+            entry["input_mtime_ns"] = stat.st_mtime_ns  # Touched but unchanged
+    return stale, hashes
+
+
+# Formats written by earlier runs stay current only if they were built from the
+# same input and spec; outputs of any other format are deleted, so the files on
+# disk always match the manifest
+def record_builds(manifest, stats, hashes, formats):
+    version = spec_version()
+    for year, s in stats.items():
+        file_path = f"data/Nat{year}.txt"
+        stat = os.stat(file_path)
+        input_sha256 = hashes.get(year) or file_sha256(file_path)
+        built = set(formats)
+        previous = manifest["years"].get(str(year), {})
+        if previous.get("input_sha256") == input_sha256 and previous.get("spec_version") == version:
+            built |= set(previous.get("formats", []))
+        for path in output_paths(year, {"csv", "parquet"} - built):
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"Removed outdated {path}")
+        manifest["years"][str(year)] = {
+            "input_sha256": input_sha256,
+            "input_size": stat.st_size,
+            "input_mtime_ns": stat.st_mtime_ns,
+            "spec_version": version,
+            "formats": sorted(built),
+            "rows": s["saved"],
+            "rule_counts": [[col, sentinel, n] for (col, sentinel, _), n in zip(sentinel_table, s["rules"])],
+        }
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Build cleaned natality CSVs from the NCHS fixed-width files.")
+    parser.add_argument("--years", type=int, nargs="+", default=years, help="Birth years to process")
+    parser.add_argument("--chunk-records", type=int, default=DEFAULT_CHUNK_RECORDS,
+                        help="Records read per block; bounds peak memory")
+    parser.add_argument("--raw", action="store_true", help="Also save every parsed record to raw_natality_{year}.csv")
+    parser.add_argument("--format", choices=["csv", "parquet", "both"], default="csv",
+                        help="Write csv_files/natality_{year}.csv, parquet_files/natality_{year}.parquet, or both")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for parallel ingest (0 = one per CPU, 1 = serial)")
+    parser.add_argument("--shards-per-year", type=int, default=None,
+                        help="Record ranges each year's file is split into (default: workers / years)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every year even if it is up to date")
+    args = parser.parse_args()
+
+    formats = ("csv", "parquet") if args.format == "both" else (args.format,)
+
+    # Only rebuild years whose input, spec or outputs changed since the last run
+    manifest = load_manifest()
+    if args.force:
+        build_years, hashes = [y for y in args.years if os.path.exists(f"data/Nat{y}.txt")], {}
+    else:
+        build_years, hashes = find_stale_years(args.years, formats, manifest, args.raw)
+    up_to_date = [y for y in args.years if y not in build_years and os.path.exists(f"data/Nat{y}.txt")]
+    if up_to_date:
+        print(f"Up to date, skipping: {up_to_date}")
+
+    # Run the processing
+    if not build_years:
+        stats = {}
+    elif args.workers == 1:
+        stats = process_files(build_years, args.chunk_records, args.raw, formats)
+    else:
+        stats = process_files_parallel(build_years, args.chunk_records, args.raw, formats,
+                                       args.workers or None, args.shards_per_year)
+
+    record_builds(manifest, stats, hashes, formats)
+    save_manifest(manifest)
+    save_filter_report({int(y): e["rule_counts"] for y, e in manifest["years"].items() if int(y) in args.years})
@@ -0,0 +1,140 @@
+# Python_files/metrics.py
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from 50us (a cached /predict) to 1s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+# Where the worker with this pid writes its snapshot
+def snapshot_path(directory, pid):
+    return os.path.join(directory, f"{pid}.json")
+
+
+# Counters and histograms in the Prometheus text exposition format.
+# Every worker process keeps its own values. With `directory` set, each worker
+# writes a snapshot there every flush_interval seconds, and render() adds up
+# the snapshots of the other workers, so a scrape of any worker sees the
+# whole server (to within flush_interval).
+class Metrics:
+    def __init__(self, descriptions, directory=None, flush_interval=5, buckets=LATENCY_BUCKETS):
+        self.descriptions = descriptions  # name -> (type, help)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.flusher_pid = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)  # buckets, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()]
+            }
+
+    def start_flushing(self):
+        if not self.directory or self.flusher_pid == os.getpid():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.flusher_pid = os.getpid()
+        threading.Thread(target=self.flush_forever, name="metrics-flusher", daemon=True).start()
+
+    def flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        path = snapshot_path(self.directory, os.getpid())
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    # Own live values plus the last snapshot of every other worker
+    def collect(self):
+        snapshots = [self.snapshot()]
+        if self.directory and os.path.isdir(self.directory):
+            own = snapshot_path(self.directory, os.getpid())
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return counters, histograms
+
+    # `gauges` are per-process values added at scrape time: {name: [(labels, value), ...]}
+    def render(self, gauges=None):
+        counters, histograms = self.collect()
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(sample(name, labels, value))
+        for (name, labels), values in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values[:len(self.buckets)] + [None]):
+                cumulative = values[-1] if count is None else cumulative + count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                samples.setdefault(name, []).append(sample(f"{name}_bucket", labels + (("le", le),), cumulative))
+            samples[name].append(sample(f"{name}_sum", labels, values[-2]))
+            samples[name].append(sample(f"{name}_count", labels, values[-1]))
+        for name, values in (gauges or {}).items():
+            samples[name] = [sample(name, tuple(sorted(labels.items())), value) for labels, value in values]
+        lines = []
+        for name in sorted(samples):
+            kind, help_text = self.descriptions.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
+
+
+def sample(name, labels, value):
+    if labels:
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+        name += "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+    return f"{name} {value}"
@@ -0,0 +1,101 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+# Binary model bundle: the scorer file's contents with every weight vector
+# and matrix stored as raw float64 instead of JSON text. Loading maps the
+# file read-only and the arrays are views into the mapping, so there is
+# nothing to parse or copy, and every server process (gunicorn workers, and
+# each worker's reloads) shares the same physical pages through the page cache.
+#
+# Layout: 8-byte magic, little-endian uint64 header length, UTF-8 JSON header,
+# then the arrays, each starting on a 64-byte boundary. The header holds the
+# scorer file's other fields (model type, feature names, encoder levels and
+# feature order, layer activations) and an "arrays" table of
+# {name: {"dtype", "shape", "offset"}}.
+
+MAGIC = b"TOLACMB1"
+ALIGNMENT = 64
+
+
+# Scorer file fields that become arrays, by model type
+def split_arrays(scorer_data):
+    header = dict(scorer_data)
+    arrays = {}
+    if header.get("model_type") == "mlp":
+        arrays["mean"] = header.pop("mean")
+        arrays["scale"] = header.pop("scale")
+        layers = []
+        for i, layer in enumerate(header.pop("layers")):
+            arrays[f"layers/{i}/weights"] = layer["weights"]
+            arrays[f"layers/{i}/bias"] = layer["bias"]
+            layers.append({key: value for key, value in layer.items() if key not in ("weights", "bias")})
+        header["layers"] = layers
+    else:
+        arrays["coef"] = header.pop("coef")
+    return header, {name: np.ascontiguousarray(values, dtype="<f8") for name, values in arrays.items()}
+
+
+def join_arrays(header, arrays):
+    scorer_data = dict(header)
+    if scorer_data.get("model_type") == "mlp":
+        scorer_data["mean"] = arrays["mean"]
+        scorer_data["scale"] = arrays["scale"]
+        scorer_data["layers"] = [dict(layer, weights=arrays[f"layers/{i}/weights"], bias=arrays[f"layers/{i}/bias"])
+                                 for i, layer in enumerate(header["layers"])]
+    else:
+        scorer_data["coef"] = arrays["coef"]
+    return scorer_data
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+# Write a scorer file's contents (as export_scorer/export_mlp build them) as a
+# bundle. Written to a temporary file and renamed: a process that has the
+# previous bundle mapped keeps reading the old file until it reloads.
+def write_bundle(scorer_data, path):
+    header, arrays = split_arrays(scorer_data)
+    # Offsets depend on the header length, which depends on the offsets; lay out
+    # the arrays after a header of the length the previous attempt produced
+    header_bytes = b""
+    while True:
+        offset = aligned(len(MAGIC) + 8 + len(header_bytes))
+        table = {}
+        for name, values in arrays.items():
+            table[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+            offset = aligned(offset + values.nbytes)
+        encoded = json.dumps(dict(header, arrays=table)).encode()
+        if aligned(len(MAGIC) + 8 + len(encoded)) == aligned(len(MAGIC) + 8 + len(header_bytes)):
+            header_bytes = encoded
+            break
+        header_bytes = encoded
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+        for name, values in arrays.items():
+            f.write(b"\0" * (table[name]["offset"] - f.tell()))
+            f.write(values.tobytes())
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# Map a bundle read-only. Returns the scorer file's contents, with the arrays
+# as read-only views into the mapping (which stays open while any view is alive).
+def read_bundle(path):
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+    (header_length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[start:start + header_length]))
+    arrays = {}
+    for name, spec in header.pop("arrays").items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec["offset"]).reshape(spec["shape"])
+    return join_arrays(header, arrays)
@@ -0,0 +1,260 @@
+# Python_files/model_registry.py
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from scoring import MODELS_DIR, default_model_path, get_risk_level, load_model, model_version
+
+logger = logging.getLogger("tolac.registry")
+
+# Published models are kept as models/versions/{version}.bundle (or .json/.pkl), named
+# by content hash, and models/registry.json points at the current version and
+# an optional candidate that is shadow scored on live traffic
+REGISTRY_FILE = "registry.json"
+
+
+def registry_path(models_dir=MODELS_DIR):
+    return os.path.join(models_dir, REGISTRY_FILE)
+
+
+def read_registry(models_dir=MODELS_DIR):
+    path = registry_path(models_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Written to a temporary file and renamed, so readers never see a partial registry
+def write_registry(registry, models_dir=MODELS_DIR):
+    path = registry_path(models_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Copy an exported model into the registry and make it the current version
+# (or the shadow candidate). Returns the version.
+def publish(path, models_dir=MODELS_DIR, candidate=False):
+    registry = read_registry(models_dir) or {"current": None, "candidate": None, "versions": {}}
+    if candidate:
+        require_current(registry, models_dir)  # Before anything is copied
+    ServedModel(path)  # Refuse files that cannot be loaded and scored
+    version = model_version(path)
+    file = os.path.join("versions", version + os.path.splitext(path)[1])
+    target = os.path.join(models_dir, file)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target + ".tmp")
+        os.replace(target + ".tmp", target)
+    registry["versions"].setdefault(version, {
+        "file": file,
+        "source": os.path.abspath(path),
+        "published": datetime.now(timezone.utc).isoformat(timespec="seconds")
+    })
+    return activate(version, models_dir, candidate, registry)
+
+
+# A candidate is only shadow scored against a current version
+def require_current(registry, models_dir=MODELS_DIR):
+    if registry.get("current") is None:
+        raise ValueError(f"No current model version in {models_dir}; publish one before a candidate")
+
+
+# Point the current version (e.g. a rollback) or the candidate at a published
+# version; a candidate of None stops shadow scoring
+def activate(version, models_dir=MODELS_DIR, candidate=False, registry=None):
+    registry = registry or read_registry(models_dir)
+    if registry is None:
+        raise ValueError(f"No model registry in {models_dir}")
+    if version is not None and version not in registry["versions"]:
+        raise ValueError(f"Unknown model version {version!r}")
+    if candidate:
+        if version is not None:
+            require_current(registry, models_dir)
+        registry["candidate"] = version
+    else:
+        if version is None:
+            raise ValueError("The current model version cannot be cleared")
+        registry["current"] = version
+        if registry.get("candidate") == version:
+            registry["candidate"] = None
+    write_registry(registry, models_dir)
+    return version
+
+
+# A loaded model, warmed up so its first request is not slower than the rest
+class ServedModel:
+    def __init__(self, path):
+        self.path = path
+        self.version = model_version(path)
+        self.model, self.feature_names, self.encoder = load_model(path)
+        self.model.predict_proba(self.encoder.encode_record({})[np.newaxis])
+
+    def info(self):
+        return {"version": self.version, "path": self.path, "features": len(self.feature_names)}
+
+
+# The models served by one process. reload() loads whatever the registry (or,
+# without one, the model file) points at and swaps it in with a single
+# assignment; requests read `current` once and keep that model to the end.
+# A failed load keeps the previous model. Each worker polls for changes every
+# poll_interval seconds once start_watching() has been called.
+class ModelRegistry:
+    def __init__(self, models_dir=MODELS_DIR, model_path=None, poll_interval=5, max_shadow_pending=100):
+        self.models_dir = models_dir
+        self.model_path = model_path  # Serve this file only, ignoring the registry
+        self.poll_interval = poll_interval
+        self.max_shadow_pending = max_shadow_pending
+        self.current = None
+        self.candidate = None
+        self.signature = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.watcher_pid = None
+        self.shadow_executor = None
+        self.shadow_pid = None
+        self.shadow_pending = 0
+        self.shadow_stats = {}
+        self.reload()
+
+    def watched_path(self):
+        if self.model_path:
+            return self.model_path
+        path = registry_path(self.models_dir)
+        return path if os.path.exists(path) else default_model_path(self.models_dir)
+
+    def resolve(self):
+        registry = None if self.model_path else read_registry(self.models_dir)
+        if registry is None:
+            return self.watched_path(), None
+        files = {version: os.path.join(self.models_dir, entry["file"]) for version, entry in registry["versions"].items()}
+        if registry.get("current") is None:
+            # Only possible in a registry written before activate() required a current version
+            return default_model_path(self.models_dir), files.get(registry.get("candidate"))
+        return files[registry["current"]], files.get(registry.get("candidate"))
+
+    def load(self, path, loaded):
+        if path is None:
+            return None
+        if loaded is not None and loaded.path == path and loaded.version == model_version(path):
+            return loaded
+        return ServedModel(path)
+
+    # Returns True when the served models changed
+    def reload(self, force=False):
+        with self.reload_lock:
+            path = self.watched_path()
+            stat = os.stat(path)
+            signature = (path, stat.st_mtime_ns, stat.st_size)
+            if signature == self.signature and not force:
+                return False
+            # Remember the signature even if loading fails, so a bad publish is reported once
+            self.signature = signature
+            current_path, candidate_path = self.resolve()
+            current = self.load(current_path, self.current)
+            candidate = self.load(candidate_path, self.candidate)
+            changed = current is not self.current or candidate is not self.candidate
+            previous = self.current.version if self.current else None
+            self.current, self.candidate = current, candidate
+        if changed:
+            logger.info("Models loaded", extra={"model_version": current.version, "previous_version": previous,
+                                                "model_path": current.path,
+                                                "candidate_version": candidate.version if candidate else None})
+        return changed
+
+    def start_watching(self):
+        if self.poll_interval <= 0 or self.watcher_pid == os.getpid():
+            return
+        self.watcher_pid = os.getpid()
+        threading.Thread(target=self.watch, name="model-watcher", daemon=True).start()
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error("Model reload failed; still serving the previous model",
+                             extra={"model_version": self.current.version, "error": str(e)})
+
+    # Score the request with the candidate model in a background thread and
+    # compare with the served probability. Dropped when too many are queued.
+    def shadow(self, served, record, probability):
+        candidate = self.candidate
+        if candidate is None:
+            return
+        with self.lock:
+            if self.shadow_pid != os.getpid():
+                self.shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+                self.shadow_pid, self.shadow_pending = os.getpid(), 0
+            if self.shadow_pending >= self.max_shadow_pending:
+                return
+            self.shadow_pending += 1
+        self.shadow_executor.submit(self.shadow_score, served.version, candidate, record, probability)
+
+    def shadow_score(self, version, candidate, record, probability):
+        try:
+            shadow_probability = candidate.model.predict_proba(candidate.encoder.encode_record(record)[np.newaxis])[0, 1]
+            diff = abs(shadow_probability - probability)
+            with self.lock:
+                stats = self.shadow_stats.setdefault((version, candidate.version), {
+                    "model_version": version, "candidate_version": candidate.version,
+                    "count": 0, "mean_abs_diff": 0.0, "max_abs_diff": 0.0, "risk_level_changes": 0})
+                stats["count"] += 1
+                stats["mean_abs_diff"] += (diff - stats["mean_abs_diff"]) / stats["count"]
+                stats["max_abs_diff"] = max(stats["max_abs_diff"], diff)
+                stats["risk_level_changes"] += get_risk_level(shadow_probability) != get_risk_level(probability)
+        except Exception as e:
+            logger.warning("Shadow scoring failed", extra={"candidate_version": candidate.version, "error": str(e)})
+        finally:
+            with self.lock:
+                self.shadow_pending -= 1
+
+    def info(self):
+        current, candidate = self.current, self.candidate
+        with self.lock:
+            shadow = [dict(stats) for stats in self.shadow_stats.values()]
+        return {
+            "current": current.info(),
+            "candidate": candidate.info() if candidate else None,
+            "registry": None if self.model_path else read_registry(self.models_dir),
+            "shadow": shadow
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish exported models to the registry served by predict.py.")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Registry directory (default: models)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish_parser = subparsers.add_parser("publish", help="Publish an exported model as the current version")
+    publish_parser.add_argument("model_file", nargs="?", default=default_model_path(), help="tolac_model.bundle, .json or .pkl")
+    publish_parser.add_argument("--candidate", action="store_true", help="Shadow score it instead of serving it")
+    activate_parser = subparsers.add_parser("activate", help="Serve (or roll back to) a published version")
+    activate_parser.add_argument("version")
+    activate_parser.add_argument("--candidate", action="store_true", help="Make it the shadow candidate instead")
+    subparsers.add_parser("clear-candidate", help="Stop shadow scoring")
+    subparsers.add_parser("list", help="Show the registry")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "publish":
+            version = publish(args.model_file, args.models_dir, args.candidate)
+            print(f"Published {args.model_file} as {'candidate' if args.candidate else 'current'} version {version}")
+        elif args.command == "activate":
+            activate(args.version, args.models_dir, args.candidate)
+            print(f"Activated version {args.version}{' as candidate' if args.candidate else ''}")
+        elif args.command == "clear-candidate":
+            activate(None, args.models_dir, candidate=True)
+            print("Cleared the candidate")
+        else:
+            print(json.dumps(read_registry(args.models_dir), indent=2))
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
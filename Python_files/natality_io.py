@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+
+# A Parquet dataset is a directory of natality_{year}.parquet files written by make_csv.py
+def is_parquet(path):
+    return os.path.isdir(path) or path.endswith(".parquet")
+
+
+# Load a cleaned natality dataset from a CSV file or a Parquet file/directory.
+# Only the requested columns are read. For Parquet the birth year filter is
+# applied by pyarrow while scanning: every file is still opened, but row groups
+# whose Birth Year statistics exclude the requested years are not decoded.
+def read_natality(path, columns=None, years=None):
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format="parquet")
+        row_filter = ds.field("Birth Year").isin(years) if years else None
+        return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+    import pandas as pd
+
+    usecols = columns
+    if years and columns and "Birth Year" not in columns:
+        usecols = columns + ["Birth Year"]
+    data = pd.read_csv(path, usecols=usecols)
+    if years:
+        data = data[data["Birth Year"].isin(years)].reset_index(drop=True)
+    if columns:
+        data = data[columns]
+    return data
+
+
+# Stream the same selection as read_natality in frames of at most chunk_rows
+# rows, so memory does not grow with the size of the dataset. `dtype` maps
+# columns to the types every chunk is read as (e.g. float32, category).
+def iter_natality(path, columns=None, years=None, chunk_rows=100_000, dtype=None):
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format="parquet")
+        row_filter = ds.field("Birth Year").isin(years) if years else None
+        for batch in dataset.to_batches(columns=columns, filter=row_filter, batch_size=chunk_rows):
+            if batch.num_rows:
+                chunk = batch.to_pandas()
+                yield chunk.astype({col: t for col, t in dtype.items() if col in chunk.columns}) if dtype else chunk
+        return
+
+    import pandas as pd
+
+    usecols = columns
+    if years and columns and "Birth Year" not in columns:
+        usecols = columns + ["Birth Year"]
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_rows, dtype=dtype):
+        if years:
+            chunk = chunk[chunk["Birth Year"].isin(years)]
+        if columns:
+            chunk = chunk[columns]
+        if len(chunk):
+            yield chunk
+
+
+# Build manifest shared by make_csv.py and make_combined_csv.py
+MANIFEST_PATH = "build_manifest.json"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"years": {}, "combined": {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest.setdefault("years", {})
+    manifest.setdefault("combined", {})
+    return manifest
+
+
+# Write to a temporary file first so an interrupted run never leaves a truncated manifest
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path, block_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,127 +1,304 @@
 # Python_files/predict.py
-from flask import Flask, request, jsonify
-import joblib
+from flask import Flask, Response, request, jsonify, g
 import numpy as np
 from flask_cors import CORS
 import os
+import sys
+import json
+import logging
+import hmac
+import time
+from scoring import MODELS_DIR, format_prediction, get_risk_levels
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry, activate
+from metrics import Metrics
+
+
+# One JSON object per log line, with any `extra` fields attached to the record
+class JsonFormatter(logging.Formatter):
+    reserved = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in self.reserved})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Application log: JSON lines on stderr at LOG_LEVEL (default INFO). Request
+# payloads and feature vectors are only logged at DEBUG.
+app_logger = logging.getLogger("tolac")
+if not app_logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    app_logger.addHandler(handler)
+    app_logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    app_logger.propagate = False
+logger = logging.getLogger("tolac.predict")
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Load model at startup
+# Load the models at startup. Under gunicorn with preload_app this runs once in
+# the master process, and the workers share the loaded model copy-on-write
+# (the weights of a .bundle model are a read-only mapping of the file, so
+# models reloaded by each worker are shared too). The current model comes from
+# models/registry.json (see model_registry.py), or the exported model file
+# (tolac_model.bundle, else tolac_model.json) when nothing has been published;
+# MODEL_PATH pins a file. Each worker checks for a new model every MODEL_RELOAD_INTERVAL seconds.
 try:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path = os.path.join(os.path.dirname(current_dir), 'models', 'tolac_model.pkl')
-
-    model_data = joblib.load(model_path)
-    model = model_data['model']
-    feature_names = model_data['feature_names']
-    print("✅ Model loaded successfully!")
-    print("Available features:", feature_names)
+    registry = ModelRegistry(os.environ.get("MODELS_DIR", MODELS_DIR), os.environ.get("MODEL_PATH"),
+                             float(os.environ.get("MODEL_RELOAD_INTERVAL", 5)))
 except Exception as e:
-    print(f"❌ Error loading model: {str(e)}")
-    print("Make sure you've run logreg.py first to create the model.")
-    exit(1)
+    logger.critical("Error loading model; make sure you've run logreg.py first to create the model",
+                    extra={'error': str(e)})
+    sys.exit(1)
 
-def preprocess_input(data):
-    try:
-        features = np.zeros(len(feature_names))
-        feature_dict = {name: idx for idx, name in enumerate(feature_names)}
-
-        numeric_fields = [
-            "Mother's Age", "Prior Births Now Living", "Prior Births Now Dead",
-            "Interval Since Last Live Birth", "Number of Prenatal Visits",
-            "Pre-pregnancy BMI", "Weight Gain", "Number of Previous Cesareans",
-            "Obstetric Estimate"
-        ]
-        for field in numeric_fields:
-            if field in data and field in feature_dict:
-                try:
-                    features[feature_dict[field]] = float(data[field])
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not convert {field} to float")
-
-        binary_fields = [
-            "Pre-pregnancy Diabetes", "Gestational Diabetes",
-            "Pre-pregnancy HTN", "Gestational HTN", "Previous Preterm Birth"
-        ]
-        for field in binary_fields:
-            field_features = [f for f in feature_names if field in f]
-            if field in data and field_features:
-                value = 1 if data[field] == "Yes" else 0
-                for feature in field_features:
-                    if feature in feature_dict:
-                        features[feature_dict[feature]] = value
-
-        categorical_mappings = {
-            "Mother's Race": ["Asian", "Black", "NHOPI", "White", "Other"],
-            "Mother's Education": ["Associate", "Bachelors", "College Credit", "Doctorate", "High School/GED", "Masters"],
-            "Payment Method": ["Medicaid", "Self-Pay"]
-        }
-        for field, values in categorical_mappings.items():
-            if field in data:
-                value = data[field]
-                for possible_value in values:
-                    feature_name = f"{field}_{possible_value}"
-                    if feature_name in feature_dict:
-                        features[feature_dict[feature_name]] = 1 if value == possible_value else 0
-
-        return features
-    except Exception as e:
-        raise ValueError(f"Error processing input data: {str(e)}")
+# Admin endpoints are enabled by setting ADMIN_TOKEN, sent as "Authorization: Bearer <token>"
+admin_token = os.environ.get("ADMIN_TOKEN")
+
+# Cache of /predict responses (PREDICTION_CACHE_SIZE=0 disables it). Set
+# PREDICTION_CACHE_DB to a file path to share entries between workers.
+# PREDICTION_CACHE_ROUNDING=1 rounds numeric inputs to the precision of the
+# training data before caching and scoring, trading exact inputs for more hits.
+cache_size = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+cache = PredictionCache(cache_size, float(os.environ.get("PREDICTION_CACHE_TTL", 3600)),
+                        os.environ.get("PREDICTION_CACHE_DB")) if cache_size > 0 else None
+cache_rounding = os.environ.get("PREDICTION_CACHE_ROUNDING") == "1"
+
+# Request counters and per-stage latency histograms, served on GET /metrics.
+# Under gunicorn, METRICS_DIR collects every worker's values (see gunicorn.conf.py).
+metrics = Metrics({
+    'tolac_requests_total': ('counter', 'HTTP requests by endpoint and status code'),
+    'tolac_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'tolac_stage_duration_seconds': ('histogram', 'Latency of the parse, cache, preprocess, score and serialize stages'),
+    'tolac_predictions_total': ('counter', 'Predictions returned by model version and risk level'),
+    'tolac_cache_requests_total': ('counter', 'Prediction cache lookups by result'),
+    'tolac_model_info': ('gauge', 'Model versions loaded by the scraped worker'),
+}, os.environ.get("METRICS_DIR"))
+STAGE = 'tolac_stage_duration_seconds'
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.inc('tolac_requests_total', endpoint=endpoint, status=response.status_code)
+    if 'started' in g:
+        metrics.observe('tolac_request_duration_seconds', time.perf_counter() - g.started, endpoint=endpoint)
+    return response
+
+def respond(payload, endpoint):
+    with metrics.time(STAGE, stage='serialize', endpoint=endpoint):
+        return jsonify(payload)
+
+# Errors are raised as is; the endpoints report them as "Data preprocessing failed: ..."
+def preprocess_input(data, out=None, served=None):
+    return (served or registry.current).encoder.encode_record(data, out)
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.json
+        with metrics.time(STAGE, stage='parse', endpoint='predict'):
+            data = request.get_json(silent=True)
         if not data:
-            print("❌ No data received")
+            logger.info("No data received", extra={'path': request.path, 'status': 400})
             return jsonify({'error': 'No data provided'}), 400
 
-        print("\n📥 Received data:")
-        print(data)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received data", extra={'data': data})
+
+        # The whole request uses one model, even if a new one is swapped in meanwhile
+        served = registry.current
 
+        # Requests are scored in canonical form (the submitted numbers, rounded
+        # only with PREDICTION_CACHE_ROUNDING), so cached and fresh responses agree
         try:
-            features = preprocess_input(data)
-            print("\n✅ Preprocessed features:")
-            print(features)
+            stage_started = time.perf_counter()
+            key = (served.version,) + served.encoder.canonicalize(data, rounded=cache_rounding)
+            preprocess_seconds = time.perf_counter() - stage_started
+            if cache is not None:
+                with metrics.time(STAGE, stage='cache', endpoint='predict'):
+                    prediction = cache.get(key)
+                metrics.inc('tolac_cache_requests_total', result='miss' if prediction is None else 'hit')
+                if prediction is not None:
+                    metrics.observe(STAGE, preprocess_seconds, stage='preprocess', endpoint='predict')
+                    metrics.inc('tolac_predictions_total', model_version=served.version,
+                                risk_level=prediction['risk_level'])
+                    return respond({
+                        'success': True,
+                        'prediction': prediction
+                    }, 'predict')
+            stage_started = time.perf_counter()
+            record = served.encoder.from_canonical(key[1:])
+            features = preprocess_input(record, served=served)
+            preprocess_seconds += time.perf_counter() - stage_started
+            metrics.observe(STAGE, preprocess_seconds, stage='preprocess', endpoint='predict')
         except Exception as e:
-            print(f"❌ Preprocessing error: {str(e)}")
+            logger.info("Preprocessing error", extra={'path': request.path, 'status': 400, 'error': str(e)})
             return jsonify({'error': f'Data preprocessing failed: {str(e)}'}), 400
 
         try:
-            probability = model.predict_proba([features])[0][1]
-            success_percentage = round(probability * 100, 1)
-            risk_level = "Low" if probability >= 0.7 else "Medium" if probability >= 0.4 else "High"
+            with metrics.time(STAGE, stage='score', endpoint='predict'):
+                probability = served.model.predict_proba(features[np.newaxis])[0, 1]
+                prediction = format_prediction(probability)
+            metrics.inc('tolac_predictions_total', model_version=served.version, risk_level=prediction['risk_level'])
+            if cache is not None:
+                cache.put(key, prediction)
+            registry.shadow(served, record, probability)
 
-            print(f"\n✅ Prediction successful: {success_percentage}% ({risk_level} Risk)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Prediction successful", extra={'features': features.tolist(), **prediction})
 
-            return jsonify({
+            return respond({
                 'success': True,
-                'prediction': {
-                    'probability': success_percentage,
-                    'risk_level': risk_level,
-                    'message': get_recommendation_message(success_percentage)
-                }
-            })
+                'prediction': prediction
+            }, 'predict')
         except Exception as e:
-            print(f"❌ Prediction error: {str(e)}")
+            logger.exception("Prediction error", extra={'path': request.path, 'status': 500})
             return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
 
     except Exception as e:
-        print(f"❌ Server error: {str(e)}")
+        logger.exception("Server error", extra={'path': request.path, 'status': 500})
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
-def get_recommendation_message(success_percentage):
-    if success_percentage >= 70:
-        return "Your chances for a successful VBAC are favorable. Consider discussing your birth plan with your healthcare provider."
-    elif success_percentage >= 40:
-        return "You have a moderate chance of VBAC success. Carefully weigh the benefits and risks with your healthcare team."
-    else:
-        return "Your VBAC success probability is lower than average. Please consult with your healthcare provider about the safest delivery option for you."
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'model_version': registry.current.version, **cache.stats()})
+
+# Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    current, candidate = registry.current, registry.candidate
+    loaded = [({'model_version': current.version, 'role': 'current'}, 1)]
+    if candidate is not None:
+        loaded.append(({'model_version': candidate.version, 'role': 'candidate'}, 1))
+    return Response(metrics.render({'tolac_model_info': loaded}), mimetype='text/plain; version=0.0.4')
+
+def is_admin(req):
+    supplied = req.headers.get('Authorization', '')
+    return admin_token is not None and hmac.compare_digest(supplied.encode(), f'Bearer {admin_token}'.encode())
+
+# Served and candidate versions, the registry and the shadow scoring comparison
+@app.route('/admin/model', methods=['GET'])
+def admin_model():
+    if not is_admin(request):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(registry.info())
+
+# Reload the models now. With {"version": ...} (and optionally "candidate": true)
+# the registry is first pointed at that published version, which the other
+# workers pick up on their next check.
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not is_admin(request):
+        return jsonify({'error': 'Forbidden'}), 403
+    body = request.get_json(silent=True) or {}
+    try:
+        if 'version' in body:
+            activate(body['version'], registry.models_dir, bool(body.get('candidate')))
+        changed = registry.reload(force=True)
+    except Exception as e:
+        logger.error("Admin reload failed", extra={'error': str(e)})
+        return jsonify({'error': f'Reload failed: {str(e)}', **registry.info()}), 400
+    return jsonify({'success': True, 'changed': changed, **registry.info()})
+
+# Largest number of records accepted by /predict/batch in one request
+MAX_BATCH_RECORDS = int(os.environ.get("MAX_BATCH_RECORDS", 10000))
+
+# Batches are a JSON array (or {"records": [...]}) or NDJSON with one record per line.
+# Returns the records and the errors for NDJSON lines that are not valid JSON.
+def parse_batch(req):
+    if req.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records, errors = [], {}
+        lines = [line for line in req.get_data(as_text=True).splitlines() if line.strip()]
+        for i, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                records.append(None)
+                errors[i] = f'Invalid JSON: {str(e)}'
+        return records, errors
+    data = req.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of records, {"records": [...]}, or NDJSON')
+    return data, {}
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        try:
+            with metrics.time(STAGE, stage='parse', endpoint='predict_batch'):
+                records, errors = parse_batch(request)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid batch: {str(e)}'}), 400
+        if not records:
+            return jsonify({'error': 'No data provided'}), 400
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({'error': f'Batch too large: {len(records)} records (max {MAX_BATCH_RECORDS})'}), 413
+
+        # Encode every record into one preallocated matrix, noting the rows that fail
+        served = registry.current
+        stage_started = time.perf_counter()
+        features = np.zeros((len(records), len(served.feature_names)))
+        valid = np.ones(len(records), dtype=bool)
+        for i, record in enumerate(records):
+            if i in errors:
+                valid[i] = False
+                continue
+            try:
+                if not isinstance(record, dict) or not record:
+                    raise ValueError("Record must be a non-empty JSON object")
+                preprocess_input(record, out=features[i], served=served)
+            except Exception as e:
+                valid[i] = False
+                errors[i] = f'Data preprocessing failed: {str(e)}'
+        metrics.observe(STAGE, time.perf_counter() - stage_started, stage='preprocess', endpoint='predict_batch')
+
+        # Score all valid rows in a single call
+        with metrics.time(STAGE, stage='score', endpoint='predict_batch'):
+            probabilities = np.zeros(len(records))
+            if valid.any():
+                probabilities[valid] = served.model.predict_proba(features[valid])[:, 1]
+
+            results = []
+            for i in range(len(records)):
+                if valid[i]:
+                    results.append({'index': i, 'success': True, 'prediction': format_prediction(probabilities[i])})
+                else:
+                    results.append({'index': i, 'success': False, 'error': errors[i]})
+        for level, count in zip(*np.unique(get_risk_levels(probabilities[valid]), return_counts=True)):
+            metrics.inc('tolac_predictions_total', int(count), model_version=served.version, risk_level=str(level))
+
+        return respond({
+            'success': True,
+            'count': len(records),
+            'failed': len(errors),
+            'predictions': results
+        }, 'predict_batch')
+
+    except Exception as e:
+        logger.exception("Server error", extra={'path': request.path, 'status': 500})
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
 if __name__ == '__main__':
+    # Single-process development server. In production run the multi-worker
+    # server instead: gunicorn -c Python_files/gunicorn.conf.py
     port = int(os.environ.get("PORT", 5001))
-    print(f"\n🚀 Starting server on port {port}...")
-    print("Press Ctrl+C to stop the server")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.environ.get("FLASK_DEBUG") == "1"
+    logger.info("Starting development server", extra={'port': port, 'debug': debug})
+    registry.start_watching()
+    metrics.start_flushing()
+    app.run(host='0.0.0.0', port=port, debug=debug)
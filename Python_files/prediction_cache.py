@@ -0,0 +1,117 @@
+# Python_files/prediction_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# In-process LRU cache of /predict responses with a TTL, keyed by the model
+# version and the canonical form of the request (FeatureEncoder.canonicalize).
+# With store_path set, entries are also kept in a SQLite file shared by every
+# worker process on the host, which is consulted on a local miss.
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl=3600, store_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = SharedStore(store_path, max_entries, ttl) if store_path else None
+        self.hits = self.shared_hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+                self.expirations += 1
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self._put_local(key, value, now)
+                with self.lock:
+                    self.shared_hits += 1
+                return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._put_local(key, value, time.monotonic())
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def _put_local(self, key, value, now):
+        with self.lock:
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+# SQLite table of cached responses shared between worker processes. Each
+# thread opens its own connection on first use (connections must not cross a
+# fork). Expired rows are purged and the table is trimmed to max_entries,
+# oldest first, every `purge_every` writes.
+class SharedStore:
+    def __init__(self, path, max_entries, ttl, purge_every=1000):
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.local = threading.local()
+        self.writes = 0
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    # The cache is an optimization: a locked or unreadable store counts as a miss
+    def get(self, key):
+        try:
+            row = self.connection().execute(
+                "SELECT value FROM predictions WHERE key = ? AND expires > ?", (json.dumps(key), time.time())).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        try:
+            conn = self.connection()
+            conn.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                         (json.dumps(key), json.dumps(value), time.time() + self.ttl))
+            self.writes += 1
+            if self.writes % self.purge_every == 0:
+                conn.execute("DELETE FROM predictions WHERE expires <= ?", (time.time(),))
+                conn.execute("DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY expires DESC "
+                             "LIMIT -1 OFFSET ?)", (self.max_entries,))
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,130 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from features import to_model_frame
+from natality_io import is_parquet
+from scoring import default_model_path, load_model, get_risk_levels
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of patients with the exported TOLAC model.")
+parser.add_argument("input_file", type=str,
+                    help="CSV file, or Parquet file/directory, in the make_csv.py layout or with the /predict field names")
+parser.add_argument("output_file", type=str, help="Output path; .parquet writes Parquet, anything else CSV")
+parser.add_argument("--model", type=str, default=default_model_path(),
+                    help="Exported model (default: models/tolac_model.bundle, else .json, else .pkl)")
+parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows scored per chunk; bounds memory")
+parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+
+# Model state of the current process (each worker loads its own copy once)
+model = encoder = None
+
+
+def init_worker(model_path):
+    global model, encoder
+    model, _, encoder = load_model(model_path)
+
+
+# Encode and score one chunk; returns the VBAC probabilities. Rows with a
+# missing numeric input (blank, unparsable, or a column absent from the file)
+# are not scored and get NaN. Absent flag and categorical columns count as
+# unset, as missing fields do in /predict.
+def score_chunk(chunk):
+    data = to_model_frame(chunk).reindex(columns=encoder.numeric_cols + encoder.binary_cols + encoder.categorical_cols)
+    X = encoder.transform(data)
+    complete = X.notna().all(axis=1).to_numpy()
+    probabilities = np.full(len(X), np.nan)
+    if complete.any():
+        # Feature names only for an sklearn model fitted with them (logreg.py fits on a sparse matrix)
+        X = X[complete] if hasattr(model, "feature_names_in_") else X[complete].to_numpy()
+        probabilities[complete] = model.predict_proba(X)[:, 1]
+    return probabilities
+
+
+def iter_chunks(path, chunk_rows):
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+
+        for batch in ds.dataset(path, format="parquet").to_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+class OutputWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self.parquet_writer.write_table(table.cast(self.parquet_writer.schema))
+        else:
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def add_scores(chunk, probabilities):
+    chunk = chunk.copy()
+    chunk["VBAC Probability"] = probabilities
+    chunk["Risk Level"] = get_risk_levels(probabilities)
+    return chunk
+
+
+# Stream the input through the model. With several workers, chunks are scored
+# in a process pool with a bounded number in flight, so memory stays constant
+# and output order matches input order.
+def score_file(input_file, output_file, model_path=None, chunk_rows=100_000, workers=1):
+    started = time.perf_counter()
+    writer = OutputWriter(output_file)
+    unscored = 0
+
+    def write(chunk, probabilities):
+        nonlocal unscored
+        unscored += int(np.isnan(probabilities).sum())
+        writer.write(add_scores(chunk, probabilities))
+
+    try:
+        if workers == 1:
+            init_worker(model_path)
+            for chunk in iter_chunks(input_file, chunk_rows):
+                write(chunk, score_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path,)) as pool:
+                in_flight = deque()
+                for chunk in iter_chunks(input_file, chunk_rows):
+                    in_flight.append((chunk, pool.submit(score_chunk, chunk)))
+                    if len(in_flight) >= 2 * workers:
+                        done_chunk, future = in_flight.popleft()
+                        write(done_chunk, future.result())
+                while in_flight:
+                    done_chunk, future = in_flight.popleft()
+                    write(done_chunk, future.result())
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - started
+    print(f"Scored {writer.rows} rows in {seconds:.1f}s ({writer.rows / max(seconds, 1e-9):,.0f} rows/s)")
+    if unscored:
+        print(f"{unscored} rows with missing numeric inputs were not scored (Risk Level 'Unknown')")
+    print(f"Scores saved to: {output_file}")
+    return writer.rows
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    score_file(args.input_file, args.output_file, args.model, args.chunk_rows, args.workers or os.cpu_count())
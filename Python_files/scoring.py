@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+from features import FeatureEncoder
+from model_bundle import read_bundle, write_bundle
+
+# Default locations of the models exported by logreg.py: the full sklearn
+# pickle and the coefficients-only scorer that needs nothing but NumPy, as a
+# readable JSON file and as a memory-mapped binary bundle (model_bundle.py).
+# MLP.py --export writes the network's NumPy scorer in both formats.
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'tolac_model.pkl')
+SCORER_PATH = os.path.join(MODELS_DIR, 'tolac_model.json')
+BUNDLE_PATH = os.path.join(MODELS_DIR, 'tolac_model.bundle')
+MLP_PATH = os.path.join(MODELS_DIR, 'tolac_mlp.json')
+MLP_BUNDLE_PATH = os.path.join(MODELS_DIR, 'tolac_mlp.bundle')
+
+
+# Prefer the bundle, then the JSON scorer, when they have been exported
+def default_model_path(models_dir=MODELS_DIR):
+    for path in (BUNDLE_PATH, SCORER_PATH):
+        path = os.path.join(models_dir, os.path.basename(path))
+        if os.path.exists(path):
+            return path
+    return os.path.join(models_dir, os.path.basename(MODEL_PATH))
+
+
+# Short content hash identifying an exported model file
+def model_version(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()[:12]
+
+
+# Logistic regression inference from the exported coefficients: a dot product
+# and a sigmoid. Exposes the sklearn predict_proba interface.
+class LogisticScorer:
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def decision_function(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_proba(self, X):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - p, p])
+
+    # Probability for a single encoded feature vector
+    def score(self, x):
+        return 1.0 / (1.0 + np.exp(-(np.dot(self.coef, x) + self.intercept)))
+
+
+# Feed-forward network inference from exported weights: standardize the
+# encoded features, then a matrix product and activation per layer. Exposes
+# the sklearn predict_proba interface, like LogisticScorer.
+class MLPScorer:
+    def __init__(self, mean, scale, layers):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.layers = [(np.asarray(layer['weights'], dtype=np.float64), np.asarray(layer['bias'], dtype=np.float64),
+                        layer['activation'], layer.get('negative_slope', 0.0)) for layer in layers]
+
+    def forward(self, X):
+        X = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        for weights, bias, activation, negative_slope in self.layers:
+            X = X @ weights + bias
+            if activation == 'leaky_relu':
+                X = np.where(X >= 0, X, negative_slope * X)
+            elif activation == 'relu':
+                X = np.maximum(X, 0)
+            elif activation == 'sigmoid':
+                X = 1.0 / (1.0 + np.exp(-X))
+        return X
+
+    def predict_proba(self, X):
+        p = self.forward(X)[:, 0]
+        return np.column_stack([1.0 - p, p])
+
+    # Probability for a single encoded feature vector
+    def score(self, x):
+        return float(self.forward(np.asarray(x)[np.newaxis])[0, 0])
+
+
+# Layers of a trained Keras Sequential network as plain arrays for MLPScorer.
+# BatchNormalization (inference mode) is folded into the preceding Dense
+# layer's weights and bias, Dropout is dropped (it is the identity at
+# inference), and LeakyReLU/ReLU layers become the activation of the layer
+# before them. Works on the layer weights only, so TensorFlow is not imported here.
+def fold_keras_layers(model):
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        if kind == 'Dense':
+            weights = layer.get_weights()
+            bias = weights[1] if config.get('use_bias', True) else np.zeros(weights[0].shape[1])
+            layers.append({'weights': weights[0].astype(np.float64), 'bias': bias.astype(np.float64),
+                           'activation': config['activation']})
+            continue
+        if not layers or layers[-1]['activation'] != 'linear':
+            raise ValueError(f"Cannot export {kind} layer {layer.name!r}: it must follow a Dense layer without activation")
+        if kind == 'BatchNormalization':
+            weights = list(layer.get_weights())
+            gamma = weights.pop(0) if config.get('scale', True) else 1.0
+            beta = weights.pop(0) if config.get('center', True) else 0.0
+            moving_mean, moving_variance = weights
+            factor = gamma / np.sqrt(moving_variance + config['epsilon'])
+            layers[-1]['weights'] = layers[-1]['weights'] * factor
+            layers[-1]['bias'] = (layers[-1]['bias'] - moving_mean) * factor + beta
+        elif kind == 'LeakyReLU':
+            layers[-1]['activation'] = 'leaky_relu'
+            layers[-1]['negative_slope'] = float(config.get('negative_slope', config.get('alpha', 0.3)))
+        elif kind in ('ReLU', 'Activation') and config.get('activation', 'relu') in ('relu', 'sigmoid'):
+            layers[-1]['activation'] = config.get('activation', 'relu')
+        else:
+            raise ValueError(f"Cannot export layer {layer.name!r} ({kind})")
+    for layer in layers:
+        if layer['activation'] not in ('linear', 'relu', 'leaky_relu', 'sigmoid'):
+            raise ValueError(f"Unsupported activation {layer['activation']!r}")
+    if not layers or layers[-1]['activation'] != 'sigmoid' or layers[-1]['weights'].shape[1] != 1:
+        raise ValueError("The network must end in a single sigmoid unit")
+    return layers
+
+
+# Written to a temporary file and renamed, so a running server never reads a
+# partial file. A .bundle path writes the binary bundle instead of JSON.
+def write_scorer_file(scorer_data, path):
+    if path.endswith('.bundle'):
+        return write_bundle(scorer_data, path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(scorer_data, f, indent=2, default=lambda value: value.tolist())  # Arrays from a bundle
+    os.replace(path + '.tmp', path)
+    return path
+
+
+# Write a fitted binary LogisticRegression as a scorer file
+def export_scorer(model, feature_names, encoder, path=SCORER_PATH):
+    return write_scorer_file({
+        'model_type': 'logistic_regression',
+        'feature_names': list(feature_names),
+        'coef': model.coef_[0].tolist(),
+        'intercept': float(model.intercept_[0]),
+        'encoder': encoder.to_dict()
+    }, path)
+
+
+# Write a trained Keras network with the standardization statistics it was
+# trained with (in encoder.feature_names order) as an MLP scorer file and
+# bundle. Returns both paths.
+def export_mlp(model, encoder, mean, scale, models_dir="models"):
+    os.makedirs(models_dir, exist_ok=True)
+    layers = fold_keras_layers(model)
+    if layers[0]['weights'].shape[0] != len(encoder.feature_names):
+        raise ValueError(f"The network has {layers[0]['weights'].shape[0]} inputs for "
+                         f"{len(encoder.feature_names)} features")
+    scorer_data = {
+        'model_type': 'mlp',
+        'feature_names': list(encoder.feature_names),
+        'mean': np.asarray(mean, dtype=np.float64).tolist(),
+        'scale': np.asarray(scale, dtype=np.float64).tolist(),
+        'layers': [{key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in layer.items()}
+                   for layer in layers],
+        'encoder': encoder.to_dict()
+    }
+    return (write_scorer_file(scorer_data, os.path.join(models_dir, os.path.basename(MLP_PATH))),
+            write_scorer_file(scorer_data, os.path.join(models_dir, os.path.basename(MLP_BUNDLE_PATH))))
+
+
+# Write the sklearn export (tolac_model.pkl), the scorer file (tolac_model.json)
+# and the scorer bundle (tolac_model.bundle). Returns the three paths.
+def export_model(model, feature_names, encoder, models_dir="models"):
+    import joblib
+
+    os.makedirs(models_dir, exist_ok=True)
+    model_path = os.path.join(models_dir, os.path.basename(MODEL_PATH))
+    joblib.dump({
+        'model': model,
+        'feature_names': list(feature_names),
+        'encoder': encoder.to_dict()
+    }, model_path)
+    scorer_path = export_scorer(model, feature_names, encoder, os.path.join(models_dir, os.path.basename(SCORER_PATH)))
+    bundle_path = export_scorer(model, feature_names, encoder, os.path.join(models_dir, os.path.basename(BUNDLE_PATH)))
+    return model_path, scorer_path, bundle_path
+
+
+# Load an exported model (.bundle or .json logistic or MLP scorer, or .pkl
+# sklearn export). Returns the model, its feature names and the fitted encoder.
+# A bundle's weights stay in the read-only mapping (the scorers do not copy float64 arrays).
+def load_model(path=None):
+    path = path or default_model_path()
+    if path.endswith(('.json', '.bundle')):
+        if path.endswith('.bundle'):
+            model_data = read_bundle(path)
+        else:
+            with open(path) as f:
+                model_data = json.load(f)
+        if model_data.get('model_type') == 'mlp':
+            model_data['model'] = MLPScorer(model_data['mean'], model_data['scale'], model_data['layers'])
+        else:
+            model_data['model'] = LogisticScorer(model_data['coef'], model_data['intercept'])
+    else:
+        # The serving requirements do not include joblib and scikit-learn
+        try:
+            import joblib
+            import sklearn  # The pickle holds a scikit-learn model
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(f"Loading {path} needs joblib and scikit-learn ({e}). Export a .json or .bundle "
+                                      f"scorer with `python scoring.py {path} <output>.bundle` where they are "
+                                      f"installed, or install them.") from e
+
+        model_data = joblib.load(path)
+    feature_names = model_data['feature_names']
+    # Older exports only carry the feature names; the encoder tables can be rebuilt from them
+    if 'encoder' in model_data:
+        encoder = FeatureEncoder.from_dict(model_data['encoder'])
+    else:
+        encoder = FeatureEncoder.from_feature_names(feature_names)
+    return model_data['model'], feature_names, encoder
+
+
+# Rows that could not be scored (NaN probability) are "Unknown"
+def get_risk_level(probability):
+    if np.isnan(probability):
+        return "Unknown"
+    return "Low" if probability >= 0.7 else "Medium" if probability >= 0.4 else "High"
+
+
+# Vectorized get_risk_level for an array of probabilities
+def get_risk_levels(probabilities):
+    return np.select([np.isnan(probabilities), probabilities >= 0.7, probabilities >= 0.4],
+                     ["Unknown", "Low", "Medium"], "High")
+
+
+def get_recommendation_message(success_percentage):
+    if success_percentage >= 70:
+        return "Your chances for a successful VBAC are favorable. Consider discussing your birth plan with your healthcare provider."
+    elif success_percentage >= 40:
+        return "You have a moderate chance of VBAC success. Carefully weigh the benefits and risks with your healthcare team."
+    else:
+        return "Your VBAC success probability is lower than average. Please consult with your healthcare provider about the safest delivery option for you."
+
+
+def format_prediction(probability):
+    success_percentage = round(float(probability) * 100, 1)
+    return {
+        'probability': success_percentage,
+        'risk_level': get_risk_level(probability),
+        'message': get_recommendation_message(success_percentage)
+    }
+
+
+if __name__ == "__main__":
+    # Convert an existing export into a scorer file or bundle
+    parser = argparse.ArgumentParser(description="Export a tolac_model.pkl (or a scorer file) as a NumPy-only "
+                                                 "scorer file, or as a bundle when the output ends in .bundle.")
+    parser.add_argument("model_file", nargs="?", default=MODEL_PATH, help="sklearn export from logreg.py, or a scorer file")
+    parser.add_argument("output_file", nargs="?", default=SCORER_PATH, help="Scorer file or bundle to write")
+    args = parser.parse_args()
+
+    if args.model_file.endswith('.bundle'):
+        # The same scorer in the other format (logistic or MLP)
+        print(f"Scorer saved to: {write_scorer_file(read_bundle(args.model_file), args.output_file)}")
+    elif args.model_file.endswith('.json'):
+        with open(args.model_file) as f:
+            print(f"Scorer saved to: {write_scorer_file(json.load(f), args.output_file)}")
+    else:
+        model, feature_names, encoder = load_model(args.model_file)
+        print(f"Scorer saved to: {export_scorer(model, feature_names, encoder, args.output_file)}")
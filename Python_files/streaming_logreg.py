@@ -0,0 +1,187 @@
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from natality_io import iter_natality
+from features import (FeatureEncoder, binary_true_values, factor_mappings, feature_cols, numeric_features,
+                      binary_features, categorical_features)
+
+# Out-of-core training of the logreg.py model. The data is streamed from disk
+# once per pass, and each chunk only contributes to a handful of small running
+# totals (value counts, a gradient vector and a features x features Hessian),
+# so memory depends on chunk_rows, not on how many years are included. The
+# last pass keeps the test rows' predictions and subgroup labels for the
+# evaluation report.
+#
+# The fit is Newton's method on liblinear's objective,
+#   0.5 * |w|^2 + C * sum(log loss)   (w including the intercept, as liblinear penalizes it),
+# which converges to the same coefficients as LogisticRegression(solver="liblinear")
+# on the in-memory data, in about ten passes.
+
+# Share of rows held out for testing, as logreg.py's train_test_split(test_size=0.3)
+TEST_SIZE = 0.3
+
+
+# Deterministic train/test assignment from the global row number, independent of chunk size
+def is_test_row(row_numbers, test_size=TEST_SIZE):
+    hashed = (row_numbers.astype(np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    return hashed < np.uint64(test_size * 2 ** 32)
+
+
+# Chunks of (raw frame, outcome, test mask) in the logreg.py layout, with any
+# extra_cols (e.g. the evaluation subgroups) kept after the features
+def iter_chunks(path, years, chunk_rows, extra_cols=()):
+    extra_cols = [col for col in extra_cols if col not in feature_cols]
+    start = 0
+    for chunk in iter_natality(path, columns=feature_cols + extra_cols + ["Delivery Method"], years=years,
+                               chunk_rows=chunk_rows):
+        chunk = chunk.reset_index(drop=True)
+        for col, mapping in factor_mappings.items():
+            if col in chunk.columns:
+                chunk[col] = chunk[col].map(mapping)
+        y = (chunk["Delivery Method"] == "VBAC").to_numpy(dtype=np.float64)
+        yield chunk[feature_cols + extra_cols], y, is_test_row(np.arange(start, start + len(chunk)))
+        start += len(chunk)
+
+
+# First pass: categorical levels, numeric medians, and which encoded columns are
+# constant in the training rows (logreg.py drops those)
+def collect_statistics(path, years, chunk_rows):
+    levels = {col: set() for col in categorical_features}
+    value_counts = {col: pd.Series(dtype=np.int64) for col in numeric_features}
+    train_counts = {col: pd.Series(dtype=np.int64) for col in numeric_features + binary_features + categorical_features}
+    train_missing = dict.fromkeys(numeric_features, False)
+    n_rows = n_train = 0
+    for X, y, test in iter_chunks(path, years, chunk_rows):
+        n_rows += len(X)
+        n_train += int((~test).sum())
+        train = X[~test]
+        for col in categorical_features:
+            levels[col].update(X[col].dropna().unique())
+        for col in numeric_features:
+            values = pd.to_numeric(X[col], errors="coerce")
+            value_counts[col] = value_counts[col].add(values.value_counts(), fill_value=0)
+            train_values = values[~test]
+            train_missing[col] |= bool(train_values.isna().any())
+            train_counts[col] = train_counts[col].add(train_values.value_counts(), fill_value=0)
+        for col in binary_features + categorical_features:
+            train_counts[col] = train_counts[col].add(train[col].value_counts(), fill_value=0)
+    if not n_rows:
+        raise ValueError(f"No rows in {path}")
+
+    # Missing numeric values are filled with the median over all rows, as logreg.py does
+    # (the mean of the two middle values for an even count, as pandas' median)
+    medians = {}
+    # A column that is blank in every row gets 0 and is dropped below as constant
+    for col, counts in value_counts.items():
+        if not len(counts):
+            medians[col] = 0.0
+            continue
+        counts = counts.sort_index()
+        n, cumulative = counts.sum(), counts.cumsum().to_numpy()
+        middle = counts.index[np.searchsorted(cumulative, [(n + 1) // 2, n // 2 + 1])]
+        medians[col] = float(middle.to_numpy().mean())
+
+    encoder = FeatureEncoder(numeric_features, binary_features, categorical_features)
+    encoder.fit_levels({col: sorted(levels[col]) for col in categorical_features})
+    constant = []
+    for col in numeric_features:
+        values = set(train_counts[col].index) | ({medians[col]} if train_missing[col] else set())
+        if len(values) <= 1:
+            constant.append(col)
+    for col in binary_features:
+        positives = sum(n for value, n in train_counts[col].items() if value in binary_true_values)
+        if positives in (0, n_train):
+            constant.append(col)
+    for col in categorical_features:
+        for level in encoder.levels[col][1:]:
+            if train_counts[col].get(level, 0) in (0, n_train):
+                constant.append(f"{col}_{level}")
+    encoder.select([name for name in encoder.feature_names if name not in constant])
+    return encoder, medians, n_rows, n_train, constant
+
+
+def design_matrix(X, encoder, medians):
+    X = X.copy()
+    for col in numeric_features:
+        X[col] = pd.to_numeric(X[col], errors="coerce").fillna(medians[col])
+    X = encoder.transform(X).to_numpy()
+    return np.hstack([X, np.ones((len(X), 1))])  # Intercept column last, as liblinear's bias feature
+
+
+# One pass over the training rows: gradient and Hessian of the summed log loss at w
+def loss_derivatives(path, years, chunk_rows, encoder, medians, w):
+    gradient = np.zeros(len(w))
+    hessian = np.zeros((len(w), len(w)))
+    loss = 0.0
+    for X, y, test in iter_chunks(path, years, chunk_rows):
+        X, y = design_matrix(X[~test], encoder, medians), y[~test]
+        z = X @ w
+        p = 1 / (1 + np.exp(-z))
+        gradient += X.T @ (p - y)
+        hessian += (X * (p * (1 - p))[:, None]).T @ X
+        loss += np.sum(np.logaddexp(0, z) - y * z)
+    return gradient, hessian, loss
+
+
+# Outcomes, predicted probabilities and the group_cols of the test rows, for evaluation.py
+def test_predictions(path, years, chunk_rows, encoder, medians, w, group_cols=()):
+    outcomes, probabilities, groups = [], [], []
+    for X, y, test in iter_chunks(path, years, chunk_rows, group_cols):
+        if not test.any():
+            continue
+        outcomes.append(y[test])
+        probabilities.append(1 / (1 + np.exp(-(design_matrix(X[test], encoder, medians) @ w))))
+        groups.append(X.loc[test, list(group_cols)])
+    if not outcomes:
+        return np.array([]), np.array([]), pd.DataFrame(columns=list(group_cols))
+    return np.concatenate(outcomes), np.concatenate(probabilities), pd.concat(groups, ignore_index=True)
+
+
+# Returns the model, the encoder and the test rows as (outcomes, predicted
+# probabilities, group_cols frame)
+def train_streaming(path, years=None, chunk_rows=100_000, C=1.0, max_passes=25, tol=1e-6, group_cols=()):
+    started = time.perf_counter()
+    print(f"Pass 1: collecting statistics from {path}...")
+    encoder, medians, n_rows, n_train, constant = collect_statistics(path, years, chunk_rows)
+    print(f"Data: {n_rows} rows ({n_train} train), {len(encoder.feature_names)} features")
+    if constant:
+        print(f"Dropped constant columns: {constant}")
+
+    w = np.zeros(len(encoder.feature_names) + 1)
+    for iteration in range(1, max_passes + 1):
+        gradient, hessian, loss = loss_derivatives(path, years, chunk_rows, encoder, medians, w)
+        print(f"Pass {iteration + 1}: objective {0.5 * w @ w + C * loss:.4f}")
+        step = np.linalg.solve(C * hessian + np.eye(len(w)), C * gradient + w)
+        w -= step
+        if np.abs(step).max() < tol:
+            break
+    else:
+        warnings.warn(f"Newton's method did not converge in {max_passes} passes (last step {np.abs(step).max():.2e}, "
+                      f"tol {tol:.0e}); increase max_passes", ConvergenceWarning)
+
+    # Wald statistics from the unpenalized Hessian at the final coefficients
+    _, hessian, _ = loss_derivatives(path, years, chunk_rows, encoder, medians, w)
+    std_err = np.sqrt(np.diag(np.linalg.pinv(hessian)))
+    z = w / std_err
+    names = encoder.feature_names + ["const"]
+    summary = pd.DataFrame({"coef": w, "std err": std_err, "z": z, "P>|z|": 2 * norm.sf(np.abs(z))},
+                           index=names).iloc[[-1] + list(range(len(w) - 1))]
+    print("\n[Coefficient Summary]")
+    print(summary.round(4).to_string())
+
+    # Same object and attributes as a LogisticRegression fitted on the in-memory frame
+    model = LogisticRegression(max_iter=1000, solver="liblinear", C=C)
+    model.coef_ = w[np.newaxis, :-1]
+    model.intercept_ = w[-1:]
+    model.classes_ = np.array([0.0, 1.0])
+    model.n_iter_ = np.array([iteration], dtype=np.int32)
+    model.n_features_in_ = len(encoder.feature_names)
+    model.feature_names_in_ = np.array(encoder.feature_names, dtype=object)
+
+    test = test_predictions(path, years, chunk_rows, encoder, medians, w, group_cols)
+    print(f"Trained in {time.perf_counter() - started:.1f}s over {iteration + 3} passes")
+    return model, encoder, test
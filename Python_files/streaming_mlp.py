@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from natality_io import iter_natality
+from features import FeatureEncoder, binary_true_values, factor_mappings
+from streaming_logreg import is_test_row
+
+# Out-of-core input for MLP.py. One pass over the data collects everything the
+# in-memory script derives from the full frame: the categorical levels, the
+# pairwise correlations used to prune features, the training-set means and
+# standard deviations used to standardize, and the class balance. Training then
+# streams typed chunks from disk once per epoch through a tf.data pipeline, so
+# memory depends on chunk_rows, not on how many years are included.
+
+# Share of rows used for validation and testing, as MLP.py's train_test_split(test_size=0.2)
+TEST_SIZE = 0.2
+
+# Features with an absolute correlation above this with an earlier feature are dropped, as in MLP.py
+MAX_CORRELATION = 0.95
+
+
+# Column types from the first rows: numeric fields as float32 and text fields
+# as categories, so every chunk is read with the same types
+def column_types(path, years, columns=None, sample_rows=10_000):
+    sample = next(iter_natality(path, columns=columns, years=years, chunk_rows=sample_rows), None)
+    if sample is None:
+        raise ValueError(f"No rows in {path}")
+    return {col: "float32" if pd.api.types.is_numeric_dtype(sample[col]) else "category" for col in sample.columns}
+
+
+# Chunks of (predictors, outcome, test mask) in the MLP.py layout
+def iter_chunks(path, years, chunk_rows, dtypes):
+    start = 0
+    for chunk in iter_natality(path, columns=list(dtypes), years=years, chunk_rows=chunk_rows, dtype=dtypes):
+        chunk = chunk.reset_index(drop=True)
+        for col, mapping in factor_mappings.items():
+            if col in chunk.columns:
+                chunk[col] = chunk[col].map(mapping).astype("category")
+        y = (chunk.pop("Delivery Method") == "VBAC").to_numpy(dtype=np.float32)
+        yield chunk, y, is_test_row(np.arange(start, start + len(chunk)), TEST_SIZE)
+        start += len(chunk)
+
+
+# Columns of the test rows (e.g. the evaluation subgroups), in the order the
+# test dataset from make_datasets() yields them, with NCHS codes mapped to labels
+def test_columns(path, years, chunk_rows, columns):
+    frames = []
+    start = 0
+    for chunk in iter_natality(path, columns=columns, years=years, chunk_rows=chunk_rows):
+        frames.append(chunk[is_test_row(np.arange(start, start + len(chunk)), TEST_SIZE)])
+        start += len(chunk)
+    data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    for col, mapping in factor_mappings.items():
+        if col in data.columns:
+            data[col] = data[col].map(mapping)
+    return data
+
+
+# Sums over the encoded columns (numeric, then Yes/No flags, then one-hot
+# levels), one-hot columns included for every level seen
+# so far (the first level of each categorical column is only known, and
+# dropped, at the end). Numeric values are shifted by the first chunk's mean
+# so the sums of squares do not lose precision. Missing numeric values count
+# pairwise, as in DataFrame.corr():
+#   pair_count[a, b]  rows where a and b are both present
+#   pair_sum[a, b]    sum of a over those rows, pair_sumsq[a, b] the same for a squared
+#   cross[a, b]       sum of a * b
+# and train_* hold per-column sums over the training rows.
+class RunningStatistics:
+    def __init__(self, numeric_cols, binary_cols, categorical_cols):
+        self.numeric_cols = list(numeric_cols)
+        self.binary_cols = list(binary_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.index = {col: i for i, col in enumerate(self.numeric_cols + self.binary_cols)}
+        self.levels = {col: set() for col in self.categorical_cols}
+        self.shift = None
+        p = len(self.index)
+        self.pair_count, self.pair_sum, self.pair_sumsq, self.cross = (np.zeros((p, p)) for _ in range(4))
+        self.train_count, self.train_sum, self.train_sumsq = (np.zeros(p) for _ in range(3))
+        self.rows = self.positives = self.train_rows = self.train_positives = 0
+
+    def add_columns(self, names):
+        for name in names:
+            self.index[name] = len(self.index)
+        p = len(self.index)
+        grow = p - len(self.train_count)
+        for attr in ("pair_count", "pair_sum", "pair_sumsq", "cross"):
+            setattr(self, attr, np.pad(getattr(self, attr), ((0, grow), (0, grow))))
+        for attr in ("train_count", "train_sum", "train_sumsq"):
+            setattr(self, attr, np.pad(getattr(self, attr), (0, grow)))
+
+    def update(self, chunk, y, test):
+        numeric = np.column_stack([pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                                   for col in self.numeric_cols]) if self.numeric_cols else np.empty((len(chunk), 0))
+        if self.shift is None:
+            with np.errstate(invalid="ignore"):
+                self.shift = np.nan_to_num(np.nanmean(numeric, axis=0)) if len(numeric) else np.zeros(numeric.shape[1])
+        levels = {col: pd.Categorical(chunk[col].dropna()).categories for col in self.categorical_cols}
+        self.add_columns([f"{col}_{level}" for col in self.categorical_cols for level in levels[col]
+                          if level not in self.levels[col]])
+        for col in self.categorical_cols:
+            self.levels[col].update(levels[col])
+
+        present = np.ones((len(chunk), len(self.index)))
+        values = np.zeros((len(chunk), len(self.index)))
+        present[:, :len(self.numeric_cols)] = ~np.isnan(numeric)
+        values[:, :len(self.numeric_cols)] = np.nan_to_num(numeric - self.shift)
+        for col in self.binary_cols:
+            values[:, self.index[col]] = chunk[col].isin(binary_true_values).to_numpy()
+        for col in self.categorical_cols:
+            labels = chunk[col].astype(object).to_numpy()
+            for level in levels[col]:
+                values[labels == level, self.index[f"{col}_{level}"]] = 1
+
+        self.pair_count += present.T @ present
+        self.pair_sum += values.T @ present
+        self.pair_sumsq += (values ** 2).T @ present
+        self.cross += values.T @ values
+        train = ~test
+        self.train_count += present[train].sum(axis=0)
+        self.train_sum += values[train].sum(axis=0)
+        self.train_sumsq += (values[train] ** 2).sum(axis=0)
+        self.rows += len(chunk)
+        self.positives += int(y.sum())
+        self.train_rows += int(train.sum())
+        self.train_positives += int(y[train].sum())
+
+    def correlation(self, names):
+        i = np.ix_([self.index[name] for name in names], [self.index[name] for name in names])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            count = self.pair_count[i]
+            mean = self.pair_sum[i] / count  # [a, b]: mean of a where b is present
+            variance = self.pair_sumsq[i] / count - mean ** 2
+            variance[variance <= 1e-12 * self.pair_sumsq[i] / count] = np.nan  # Constant columns
+            covariance = self.cross[i] / count - mean * mean.T
+            correlation = covariance / np.sqrt(variance * variance.T)
+        return pd.DataFrame(correlation, index=names, columns=names)
+
+    # Training-set mean and standard deviation per column, as StandardScaler
+    # (missing values ignored, a zero standard deviation scales by 1)
+    def scaling(self, names):
+        i = [self.index[name] for name in names]
+        shift = np.concatenate([self.shift, np.zeros(len(self.index) - len(self.shift))])[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.train_sum[i] / self.train_count[i]
+            std = np.sqrt(np.clip(self.train_sumsq[i] / self.train_count[i] - mean ** 2, 0, None))
+        mean = np.nan_to_num(mean + shift)
+        return mean, np.where(std > 1e-12 * np.maximum(np.abs(mean), 1), std, 1.0)
+
+
+# The streaming pass: returns the fitted encoder (without the highly
+# correlated features), the standardization mean and scale in the encoder's
+# feature order, the chunk dtypes, the RunningStatistics (row and class
+# counts) and the dropped features. Without `features` (numeric, binary and
+# categorical column lists) every column is used, as MLP.py does.
+def collect_statistics(path, years=None, chunk_rows=100_000, features=None):
+    if features:
+        numeric_cols, binary_cols, categorical_cols = features
+        dtypes = column_types(path, years, list(numeric_cols) + list(binary_cols) + list(categorical_cols)
+                              + ["Delivery Method"])
+    else:
+        dtypes = column_types(path, years)
+        predictors = [col for col in dtypes if col != "Delivery Method"]
+        categorical_cols = [col for col in predictors if col in factor_mappings or dtypes[col] == "category"]
+        numeric_cols = [col for col in predictors if col not in categorical_cols]
+        binary_cols = []
+    stats = RunningStatistics(numeric_cols, binary_cols, categorical_cols)
+    for chunk, y, test in iter_chunks(path, years, chunk_rows, dtypes):
+        stats.update(chunk, y, test)
+
+    encoder = FeatureEncoder(numeric_cols, binary_cols, categorical_cols)
+    encoder.fit_levels({col: sorted(stats.levels[col]) for col in categorical_cols})
+    corr_matrix = stats.correlation(encoder.feature_names).abs()
+    upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
+    dropped = [column for column in upper.columns if any(upper[column] > MAX_CORRELATION)]
+    encoder.select([col for col in encoder.feature_names if col not in dropped])
+    mean, scale = stats.scaling(encoder.feature_names)
+    return encoder, mean, scale, dtypes, stats, dropped
+
+
+# Training and test tf.data pipelines. A generator reads and encodes chunks in
+# batches; standardization runs in a parallel map, and batches are shuffled
+# across chunks and prefetched while the model trains. Each epoch re-reads the file.
+def make_datasets(path, years, chunk_rows, dtypes, encoder, mean, scale, batch_size=256, parallel_calls=None,
+                  shuffle_batches=64, options=None):
+    import tensorflow as tf
+
+    n_features = len(encoder.feature_names)
+    mean = tf.constant(mean, dtype=tf.float32)
+    scale = tf.constant(scale, dtype=tf.float32)
+    options = options or tf.data.Options()
+
+    def dataset(test_rows, shuffle):
+        def batches():
+            rng = np.random.default_rng()
+            for chunk, outcome, test in iter_chunks(path, years, chunk_rows, dtypes):
+                keep = test if test_rows else ~test
+                x = encoder.transform(chunk[keep]).to_numpy(dtype=np.float32)
+                y = outcome[keep]
+                order = rng.permutation(len(x)) if shuffle else np.arange(len(x))
+                for start in range(0, len(order), batch_size):
+                    rows = order[start:start + batch_size]
+                    yield x[rows], y[rows]
+
+        data = tf.data.Dataset.from_generator(batches, output_signature=(
+            tf.TensorSpec(shape=(None, n_features), dtype=tf.float32), tf.TensorSpec(shape=(None,), dtype=tf.float32)))
+        # A missing numeric value becomes 0 after standardizing, i.e. the training mean, as in MLP.py
+        data = data.map(lambda x, y: (tf.where(tf.math.is_nan(x), 0.0, (x - mean) / scale), y),
+                        num_parallel_calls=parallel_calls or tf.data.AUTOTUNE, deterministic=not shuffle)
+        if shuffle:
+            data = data.shuffle(shuffle_batches)
+        return data.prefetch(tf.data.AUTOTUNE).with_options(options)
+
+    return dataset(test_rows=False, shuffle=True), dataset(test_rows=True, shuffle=False)
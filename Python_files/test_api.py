@@ -1,5 +1,15 @@
 import requests
 import json
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
 
 # Sample test data that matches our form fields
 test_data = {
@@ -22,6 +32,68 @@ test_data = {
     "Payment Method": "Self-Pay"
 }
 
+# Approximate distributions of the form fields in the TOLAC cohort (singleton
+# births to mothers with one or two previous cesareans), used to generate
+# random payloads: (mean, sd, min, max) for the numeric fields, the share of
+# "Yes" for the flags, and option weights for the categorical fields
+numeric_distributions = {
+    "Mother's Age": (31, 5.5, 15, 50),
+    "Prior Births Now Living": (1.6, 1.0, 0, 10),
+    "Prior Births Now Dead": (0.03, 0.2, 0, 3),
+    "Interval Since Last Live Birth": (45, 30, 9, 240),
+    "Number of Prenatal Visits": (11.5, 4, 0, 40),
+    "Pre-pregnancy BMI": (28.5, 6.5, 14, 65),
+    "Weight Gain": (26, 14, 0, 98),
+    "Number of Previous Cesareans": (1.15, 0.36, 1, 2),
+    "Obstetric Estimate": (38.6, 1.5, 20, 44)
+}
+flag_rates = {
+    "Pre-pregnancy Diabetes": 0.02,
+    "Gestational Diabetes": 0.09,
+    "Pre-pregnancy HTN": 0.03,
+    "Gestational HTN": 0.07,
+    "Previous Preterm Birth": 0.04
+}
+option_weights = {
+    "Mother's Race": {"White": 0.49, "Black": 0.15, "AIAN": 0.01, "Asian": 0.06, "NHOPI": 0.003,
+                      "multirace": 0.017, "Hispanic": 0.27},
+    "Mother's Education": {"8th grade or less": 0.03, "9-12th grade": 0.08, "High School/GED": 0.26,
+                           "College Credit": 0.2, "Associate": 0.1, "Bachelors": 0.2, "Masters": 0.1,
+                           "Doctorate": 0.03},
+    "Payment Method": {"Medicaid": 0.42, "Private Insurance": 0.5, "Self-Pay": 0.03, "Indian Health Service": 0.002,
+                       "CHAMPUS/TRICARE": 0.02, "Other Gov": 0.01, "Other": 0.018}
+}
+
+
+# Random patient payloads, posted as strings like the mobile app form does.
+# A share of requests re-sends an earlier payload, as users re-submitting the form do.
+class PayloadGenerator:
+    def __init__(self, seed=0, repeat_fraction=0.0, pool_size=1000):
+        self.rng = np.random.default_rng(seed)
+        self.repeat_fraction = repeat_fraction
+        self.pool = [self.random_payload() for _ in range(pool_size)]
+        self.lock = threading.Lock()
+
+    def random_payload(self):
+        payload = {}
+        for field, (mean, sd, low, high) in numeric_distributions.items():
+            value = float(np.clip(self.rng.normal(mean, sd), low, high))
+            payload[field] = str(round(value, 1) if field == "Pre-pregnancy BMI" else int(round(value)))
+        for field, rate in flag_rates.items():
+            payload[field] = "Yes" if self.rng.random() < rate else "No"
+        for field, weights in option_weights.items():
+            options = list(weights)
+            p = np.array(list(weights.values()))
+            payload[field] = options[self.rng.choice(len(options), p=p / p.sum())]
+        return payload
+
+    def next(self):
+        with self.lock:
+            if self.rng.random() < self.repeat_fraction:
+                return self.pool[self.rng.integers(len(self.pool))]
+            return self.random_payload()
+
+
 def test_endpoint(url):
     print(f"\n🔍 Testing endpoint: {url}")
     print("\n📤 Sending test data:")
@@ -30,9 +102,9 @@ def test_endpoint(url):
     try:
         # Make the POST request to our prediction endpoint
         response = requests.post(url, json=test_data, timeout=5)
-        
+
         print("\n📥 Response status code:", response.status_code)
-        
+
         if response.ok:
             result = response.json()
             print("\n✅ Prediction result:")
@@ -40,7 +112,7 @@ def test_endpoint(url):
         else:
             print("\n❌ Error response:")
             print(json.dumps(response.json(), indent=2))
-            
+
     except requests.exceptions.ConnectionError:
         print(f"\n❌ Error: Could not connect to the server at {url}")
     except requests.exceptions.Timeout:
@@ -48,6 +120,179 @@ def test_endpoint(url):
     except Exception as e:
         print(f"\n❌ Error: {str(e)}")
 
-# Test both localhost and the IP address
-test_endpoint('http://localhost:5001/predict')
-test_endpoint('http://192.168.68.136:5001/predict') 
\ No newline at end of file
+
+# Send one payload and record (latency from the scheduled start, status).
+# Status 0 means the request failed without a response.
+def send(session, url, payload, scheduled, timeout, results):
+    try:
+        response = session.post(url, json=payload, timeout=timeout)
+        status = response.status_code
+    except requests.exceptions.RequestException:
+        status = 0
+    results.append((time.perf_counter() - scheduled, status))
+
+
+# Closed loop: `concurrency` clients, each sending its next request as soon as
+# the previous one returns, until `total` requests or `duration` seconds
+def run_closed_loop(url, generator, concurrency, total, duration, timeout):
+    results, counter, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                if (total and counter[0] >= total) or (deadline and time.perf_counter() >= deadline):
+                    return
+                counter[0] += 1
+            send(session, url, generator.next(), time.perf_counter(), timeout, results)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+# Open loop: requests start at `rate` per second (Poisson arrivals) whether or
+# not earlier ones have returned, with at most `concurrency` in flight. Latency
+# is measured from the scheduled start, so queueing behind a slow server counts.
+def run_open_loop(url, generator, concurrency, rate, total, duration, timeout):
+    results = []
+    sessions = threading.local()
+    rng = np.random.default_rng()
+
+    def task(payload, scheduled):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        send(sessions.session, url, payload, scheduled, timeout, results)
+
+    total = total or int(rate * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        scheduled = started
+        for _ in range(total):
+            scheduled += rng.exponential(1 / rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, generator.next(), scheduled)
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed, config, started_at):
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    statuses = np.array([status for _, status in results])
+    ok = (statuses >= 200) & (statuses < 300)
+    status_counts = {str(status): int(count) for status, count in zip(*np.unique(statuses, return_counts=True))}
+    summary = {
+        "config": config,
+        "started_at": started_at,
+        "requests": len(results),
+        "errors": int((~ok).sum()),
+        "error_rate": round(float((~ok).mean()), 6) if len(results) else 0.0,
+        "status_counts": status_counts,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0.0
+    }
+    if ok.any():
+        p50, p95, p99 = np.percentile(latencies[ok], [50, 95, 99])
+        summary["latency_ms"] = {
+            "mean": round(float(latencies[ok].mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latencies[ok].max()), 3)
+        }
+    return summary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Start predict.py locally (development server or gunicorn) and wait until it answers
+def start_server(mode, workers, port):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    if mode == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(here, "gunicorn.conf.py")]
+    else:
+        command = [sys.executable, os.path.join(here, "predict.py")]
+    server = subprocess.Popen(command, env=env, cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/predict"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with code {server.returncode}")
+        try:
+            requests.post(url, json=test_data, timeout=1)
+            return server, url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"{mode} server did not start within 60 seconds")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Smoke test or load test the /predict endpoint. Without --requests or --duration, "
+                    "sends the sample record once and prints the response.")
+    parser.add_argument("--url", default="http://localhost:5001/predict", help="Endpoint to test")
+    parser.add_argument("--serve", choices=["flask", "gunicorn"],
+                        help="Start predict.py locally in this mode on a free port and test it (ignores --url)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="gunicorn workers for --serve gunicorn")
+    parser.add_argument("--requests", type=int, help="Number of requests to send")
+    parser.add_argument("--duration", type=float, help="Seconds to run for")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients (max in flight with --rate)")
+    parser.add_argument("--rate", type=float, help="Open loop: requests per second, regardless of response times")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent before measuring")
+    parser.add_argument("--repeat-fraction", type=float, default=0.0,
+                        help="Share of requests re-sending an earlier payload (exercises the prediction cache)")
+    parser.add_argument("--seed", type=int, default=0, help="Payload generator seed")
+    parser.add_argument("--timeout", type=float, default=5, help="Request timeout in seconds")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    try:
+        if args.serve:
+            server, url = start_server(args.serve, args.workers, free_port())
+
+        if not args.requests and not args.duration:
+            test_endpoint(url)
+            sys.exit(0)
+
+        generator = PayloadGenerator(args.seed, args.repeat_fraction)
+        if args.warmup:
+            run_closed_loop(url, generator, min(args.concurrency, args.warmup), args.warmup, None, args.timeout)
+
+        config = {
+            "url": url, "serve": args.serve, "workers": args.workers if args.serve == "gunicorn" else None,
+            "mode": "open" if args.rate else "closed", "concurrency": args.concurrency, "rate": args.rate,
+            "requests": args.requests, "duration": args.duration, "repeat_fraction": args.repeat_fraction,
+            "seed": args.seed
+        }
+        started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        print(f"Load testing {url} ({config['mode']} loop)...", file=sys.stderr)
+        if args.rate:
+            results, elapsed = run_open_loop(url, generator, args.concurrency, args.rate, args.requests,
+                                             args.duration, args.timeout)
+        else:
+            results, elapsed = run_closed_loop(url, generator, args.concurrency, args.requests, args.duration,
+                                               args.timeout)
+
+        summary = summarize(results, elapsed, config, started_at)
+        print(json.dumps(summary, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from features import FeatureEncoder, binary_features, categorical_features, numeric_features
+
+TRAINING = pd.DataFrame({
+    **{col: [30.0 + i for i in range(4)] for col in numeric_features},
+    **{col: ["Y", "N", "N", "Y"] for col in binary_features},
+    "Mother's Race/Hispanic": pd.Categorical(["White", "Black", "Hispanic", "Asian"]),
+    "Mother's Education": pd.Categorical(["Bachelor's", "Master's", "High school/GED", "Associate degree"]),
+    "Payment": pd.Categorical(["Medicaid", "Private Insurance", "Self-Pay", "Medicaid"]),
+})
+TRAINING["Pre-pregnancy BMI"] = [24.3, 31.75, np.nan, 19.0]
+
+REQUEST = {
+    **{col: "30" for col in numeric_features},
+    "Pre-pregnancy BMI": "24.34",
+    "Gestational Diabetes": "Yes",
+    "Pre-pregnancy HTN": "N",
+    "Mother's Race": "Black",
+    "Mother's Education": "Masters",
+    "Payment Method": "Self-Pay",
+}
+
+
+@pytest.fixture
+def encoder():
+    return FeatureEncoder().fit(TRAINING)
+
+
+def test_transform_matches_get_dummies_with_drop_first(encoder):
+    X = encoder.transform(TRAINING)
+    expected = TRAINING[numeric_features].join(TRAINING[binary_features].eq("Y").astype(float)).join(
+        pd.get_dummies(TRAINING[categorical_features], drop_first=True, dtype=float))
+    assert list(X.columns) == list(expected.columns)
+    np.testing.assert_array_equal(X.to_numpy(), expected.to_numpy())
+
+
+def test_encode_record_matches_transform_of_the_same_row(encoder):
+    row = TRAINING.iloc[[1]]
+    record = {col: str(row[col].iloc[0]) for col in TRAINING.columns}
+    np.testing.assert_array_equal(encoder.encode_record(record), encoder.transform(row).to_numpy()[0])
+
+
+def test_encode_record_maps_app_field_names_and_option_values(encoder):
+    x = dict(zip(encoder.feature_names, encoder.encode_record(REQUEST)))
+    assert x["Pre-pregnancy BMI"] == 24.34
+    assert x["Gestational Diabetes"] == 1 and x["Pre-pregnancy HTN"] == 0
+    assert "Mother's Race/Hispanic_Asian" not in x  # First level, dropped
+    assert x["Mother's Race/Hispanic_Black"] == 1
+    assert x["Mother's Education_Master's"] == 1
+    assert x["Payment_Self-Pay"] == 1
+    assert sum(x.values()) == pytest.approx(30 * 8 + 24.34 + 4)
+
+
+def test_encode_record_leaves_missing_fields_and_unknown_levels_at_zero(encoder):
+    x = encoder.encode_record({"Mother's Age": "", "Payment Method": "Barter"})
+    assert not x.any()
+
+
+def test_encode_record_reuses_the_output_buffer(encoder):
+    out = np.full(len(encoder.feature_names), 7.0)
+    assert encoder.encode_record({"Weight Gain": "12"}, out) is out
+    assert out.sum() == 12
+
+
+@pytest.mark.parametrize("value", ["NaN", "inf", "-Infinity", "thirty", float("nan")])
+def test_encode_record_rejects_non_finite_and_non_numeric_values(encoder, value):
+    with pytest.raises(ValueError, match="Weight Gain"):
+        encoder.encode_record({"Weight Gain": value})
+    with pytest.raises(ValueError, match="Weight Gain"):
+        encoder.canonicalize({"Weight Gain": value})
+
+
+def test_canonicalize_is_shared_by_equivalent_requests(encoder):
+    spelled_out = dict(REQUEST, **{"Mother's Age": "30.0", "Gestational Diabetes": "Y",
+                                   "Mother's Education": "Master's", "Payment": "Self-Pay"})
+    del spelled_out["Payment Method"]
+    assert encoder.canonicalize(spelled_out) == encoder.canonicalize(REQUEST)
+
+
+def test_canonicalize_rounds_only_when_asked(encoder):
+    key = encoder.from_canonical(encoder.canonicalize(REQUEST))
+    assert key["Pre-pregnancy BMI"] == 24.34
+    rounded = encoder.from_canonical(encoder.canonicalize(dict(REQUEST, **{"Weight Gain": "12.4"}), rounded=True))
+    assert rounded["Pre-pregnancy BMI"] == 24.3 and rounded["Weight Gain"] == 12
+
+
+def test_canonical_form_encodes_like_the_request(encoder):
+    key = encoder.canonicalize(dict(REQUEST, **{"Payment Method": "Barter"}))
+    assert encoder.from_canonical(key)["Payment"] is None
+    np.testing.assert_array_equal(encoder.encode_record(encoder.from_canonical(key)),
+                                  encoder.encode_record(dict(REQUEST, **{"Payment Method": "Barter"})))
+
+
+def test_from_feature_names_rebuilds_the_encoder(encoder):
+    rebuilt = FeatureEncoder.from_feature_names(encoder.feature_names)
+    assert rebuilt.feature_names == encoder.feature_names
+    np.testing.assert_array_equal(rebuilt.encode_record(REQUEST), encoder.encode_record(REQUEST))
+    np.testing.assert_array_equal(FeatureEncoder.from_dict(encoder.to_dict()).encode_record(REQUEST),
+                                  encoder.encode_record(REQUEST))
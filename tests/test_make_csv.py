@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from make_csv import (MISSING, col_positions, cohort_mask, parse_block, parse_flag, parse_float, parse_int,
+                      read_natality_file)
+
+RECORD_LENGTH = 1345
+
+
+def field(*values):
+    width = len(values[0])
+    return np.frombuffer("".join(values).encode(), dtype=np.uint8).reshape(-1, width)
+
+
+# Fixed-width records with the given fields set (everything else blank)
+def records(*rows):
+    block = np.full((len(rows), RECORD_LENGTH), ord(" "), dtype=np.uint8)
+    block[:, -1] = ord("\n")
+    for i, row in enumerate(rows):
+        for col, text in row.items():
+            start, end = col_positions[col]
+            assert len(text) == end - start
+            block[i, start:end] = np.frombuffer(text.encode(), dtype=np.uint8)
+    return block
+
+
+def cohort_record(**fields):
+    row = {"Plurality": "1", "Number of Previous Cesareans": "01", "TOLAC Attempted (if cesarean)": "Y"}
+    row.update(fields)
+    return row
+
+
+def test_parse_int_reads_zero_padded_codes():
+    assert parse_int(field("07", "00", "99", " 7")).tolist() == [7, 0, 99, 7]
+
+
+def test_parse_int_maps_blank_and_malformed_fields_to_missing():
+    assert parse_int(field("  ", "1a", "-1")).tolist() == [MISSING] * 3
+
+
+def test_parse_float_maps_blank_and_malformed_fields_to_nan():
+    values = parse_float(field("24.3", "    ", "ab.1", "99.9"))
+    assert values[0] == 24.3 and values[3] == 99.9
+    assert np.isnan(values[1]) and np.isnan(values[2])
+
+
+def test_parse_flag_dictionary_encodes_letters():
+    flags = parse_flag(field("Y", "N", " ", "Y"))
+    assert list(flags.categories) == ["N", "Y"]
+    assert flags.isna().tolist() == [False, False, True, False]
+    assert flags[0] == "Y"
+
+
+def test_cohort_mask_keeps_singletons_with_one_or_two_cesareans_and_tolac():
+    block = records(cohort_record(), cohort_record(**{"Number of Previous Cesareans": "02",
+                                                      "TOLAC Attempted (if cesarean)": "X"}),
+                    cohort_record(Plurality="2"), cohort_record(**{"Number of Previous Cesareans": "03"}),
+                    cohort_record(**{"TOLAC Attempted (if cesarean)": "N"}))
+    assert cohort_mask(block).tolist() == [True, True, False, False, False]
+
+
+def test_parse_block_types_columns():
+    df = parse_block(records(cohort_record(**{"Weight Gain": "25", "Pre-pregnancy BMI": "24.3",
+                                              "Gestational HTN": "N"})))
+    assert df["Weight Gain"].dtype == np.int16 and df["Weight Gain"][0] == 25
+    assert df["Pre-pregnancy BMI"][0] == 24.3
+    assert df["Gestational HTN"][0] == "N"
+    assert df["Mother's Age"][0] == MISSING
+
+
+@pytest.mark.parametrize("chunk_records", [1, 2, 1000])
+def test_read_natality_file_keeps_the_cohort_whatever_the_block_size(tmp_path, chunk_records):
+    block = records(*[cohort_record(**{"Mother's Age": f"{20 + i:02d}"}) if i % 2 else cohort_record(Plurality="2")
+                      for i in range(7)])
+    path = tmp_path / "Nat2021.txt"
+    path.write_bytes(block.tobytes()[:-1])  # No line terminator after the last record
+    df, n_records = read_natality_file(str(path), chunk_records=chunk_records)
+    assert n_records == 7
+    assert df["Mother's Age"].tolist() == [21, 23, 25]
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+from model_registry import ModelRegistry, activate, publish, read_registry
+from scoring import MODELS_DIR, model_version
+
+JSON_PATH = os.path.join(MODELS_DIR, "tolac_model.json")
+BUNDLE_PATH = os.path.join(MODELS_DIR, "tolac_model.bundle")
+
+
+def test_candidate_needs_a_current_version(tmp_path):
+    with pytest.raises(ValueError, match="No current model version"):
+        publish(JSON_PATH, str(tmp_path), candidate=True)
+    assert os.listdir(tmp_path) == []
+
+
+def test_unloadable_files_are_not_published(tmp_path):
+    bad = tmp_path / "bad.json"
+    bad.write_text("{}")
+    models_dir = tmp_path / "models"
+    with pytest.raises(KeyError):
+        publish(str(bad), str(models_dir))
+    assert not models_dir.exists()
+
+
+def test_publish_candidate_and_roll_back(tmp_path):
+    models_dir = str(tmp_path)
+    current = publish(JSON_PATH, models_dir)
+    assert current == model_version(JSON_PATH)
+    registry = ModelRegistry(models_dir, poll_interval=0)
+    assert registry.current.version == current and registry.candidate is None
+
+    candidate = publish(BUNDLE_PATH, models_dir, candidate=True)
+    assert read_registry(models_dir)["candidate"] == candidate
+    assert registry.reload()
+    assert registry.current.version == current and registry.candidate.version == candidate
+
+    activate(candidate, models_dir)
+    assert registry.reload()
+    assert registry.current.version == candidate and registry.candidate is None
+    activate(current, models_dir)
+    assert registry.reload()
+    assert registry.current.version == current
+    assert not registry.reload()
+
+    with pytest.raises(ValueError, match="Unknown model version"):
+        activate("0123456789ab", models_dir)
+
+
+def test_shadow_scores_are_compared_with_the_served_probability(tmp_path):
+    models_dir = str(tmp_path)
+    publish(JSON_PATH, models_dir)
+    publish(BUNDLE_PATH, models_dir, candidate=True)
+    registry = ModelRegistry(models_dir, poll_interval=0)
+    served, candidate = registry.current, registry.candidate
+    record = {"Mother's Age": "30", "Weight Gain": "25", "Number of Previous Cesareans": "1"}
+    probability = candidate.model.predict_proba(candidate.encoder.encode_record(record)[None])[0, 1]
+    other = 0.0 if probability >= 0.4 else 1.0  # A different risk level
+    registry.shadow_pending = 2
+    registry.shadow_score(served.version, candidate, record, probability)
+    registry.shadow_score(served.version, candidate, record, other)
+    [stats] = registry.info()["shadow"]
+    assert stats["count"] == 2 and stats["risk_level_changes"] == 1
+    assert stats["max_abs_diff"] == pytest.approx(abs(other - probability))
+    assert stats["mean_abs_diff"] == pytest.approx(abs(other - probability) / 2)
+    assert registry.shadow_pending == 0
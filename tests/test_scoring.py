@@ -0,0 +1,135 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from features import FeatureEncoder, binary_features, numeric_features
+from score_file import score_file
+from scoring import (MODELS_DIR, LogisticScorer, MLPScorer, export_mlp, export_model, format_prediction,
+                     get_risk_level, get_risk_levels, load_model)
+from sklearn.linear_model import LogisticRegression
+
+LEVELS = {"Mother's Race/Hispanic": ["Asian", "Black", "White"],
+          "Mother's Education": ["Bachelor's", "High school/GED", "Master's"],
+          "Payment": ["Medicaid", "Private Insurance", "Self-Pay"]}
+
+# Patients in the NCHS code layout, as score_file.py reads them
+PATIENTS = pd.DataFrame({
+    **{col: [30, 1, 0, 24, 12, 25.1, 25, 1, 39][i] for i, col in enumerate(numeric_features)},
+    **{col: "N" for col in binary_features},
+    "Mother's Race/Hispanic": 1, "Mother's Education": 6, "Payment": 2,
+}, index=range(4))
+PATIENTS.loc[1, "Weight Gain"] = np.nan
+PATIENTS.loc[2, "Gestational Diabetes"] = "Y"
+PATIENTS.loc[3, "Mother's Race/Hispanic"] = 2
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    encoder = FeatureEncoder().fit_levels(LEVELS)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, len(encoder.feature_names)))
+    y = (X[:, 0] + 0.5 * X[:, 3] + rng.normal(size=500) > 0).astype(int)
+    return LogisticRegression().fit(X, y), encoder, X
+
+
+def test_logistic_scorer_matches_sklearn(fitted):
+    model, _, X = fitted
+    scorer = LogisticScorer(model.coef_[0], model.intercept_[0])
+    np.testing.assert_allclose(scorer.predict_proba(X), model.predict_proba(X), rtol=1e-12)
+    assert scorer.score(X[0]) == pytest.approx(model.predict_proba(X[:1])[0, 1], rel=1e-12)
+
+
+def test_exported_files_score_alike(fitted, tmp_path):
+    model, encoder, X = fitted
+    paths = export_model(model, encoder.feature_names, encoder, str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ["tolac_model.pkl", "tolac_model.json", "tolac_model.bundle"]
+    for path in paths:
+        loaded, feature_names, loaded_encoder = load_model(path)
+        assert feature_names == encoder.feature_names
+        assert loaded_encoder.levels == encoder.levels
+        np.testing.assert_allclose(loaded.predict_proba(X)[:, 1], model.predict_proba(X)[:, 1], rtol=1e-12)
+
+
+def test_bundle_weights_are_read_only(fitted, tmp_path):
+    model, encoder, _ = fitted
+    _, _, bundle_path = export_model(model, encoder.feature_names, encoder, str(tmp_path))
+    scorer, _, _ = load_model(bundle_path)
+    with pytest.raises(ValueError):
+        scorer.coef[0] = 0
+
+
+def test_checked_in_exports_agree():
+    probabilities = []
+    for name in ("tolac_model.pkl", "tolac_model.json", "tolac_model.bundle"):
+        model, feature_names, encoder = load_model(os.path.join(MODELS_DIR, name))
+        x = encoder.encode_record({"Mother's Age": "30", "Weight Gain": "25", "Number of Previous Cesareans": "1",
+                                   "Mother's Race": "White", "Payment Method": "Medicaid"})
+        probabilities.append(model.predict_proba(pd.DataFrame([x], columns=feature_names))[0, 1])
+    assert probabilities == pytest.approx([probabilities[0]] * 3, rel=1e-12)
+
+
+def test_mlp_scorer_forward_pass():
+    layers = [{"weights": [[1.0, -1.0], [0.5, 2.0]], "bias": [0.0, -1.0], "activation": "leaky_relu",
+               "negative_slope": 0.1},
+              {"weights": [[2.0], [1.0]], "bias": [0.5], "activation": "sigmoid"}]
+    scorer = MLPScorer(mean=[1.0, 0.0], scale=[2.0, 1.0], layers=layers)
+    X = np.array([[3.0, 1.0], [1.0, -1.0]])
+    hidden = (X - [1.0, 0.0]) / [2.0, 1.0] @ np.array([[1.0, -1.0], [0.5, 2.0]]) + [0.0, -1.0]
+    hidden = np.where(hidden >= 0, hidden, 0.1 * hidden)
+    expected = 1 / (1 + np.exp(-(hidden @ [2.0, 1.0] + 0.5)))
+    np.testing.assert_allclose(scorer.predict_proba(X)[:, 1], expected, rtol=1e-12)
+    assert scorer.score(X[1]) == pytest.approx(expected[1], rel=1e-12)
+
+
+def test_mlp_export_matches_keras(tmp_path):
+    pytest.importorskip("tensorflow")
+    from MLP import build_model
+
+    encoder = FeatureEncoder().fit_levels(LEVELS)
+    rng = np.random.default_rng(1)
+    X = rng.normal(3.0, 2.0, size=(256, len(encoder.feature_names)))
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    network = build_model(X.shape[1])
+    network.fit((X - mean) / scale, (X[:, 0] > 3).astype(float), epochs=2, verbose=0)
+    expected = network.predict((X - mean) / scale, verbose=0)[:, 0]
+    for path in export_mlp(network, encoder, mean, scale, str(tmp_path)):
+        scorer, _, _ = load_model(path)
+        np.testing.assert_allclose(scorer.predict_proba(X)[:, 1], expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("probability, level", [(0.95, "Low"), (0.7, "Low"), (0.69, "Medium"), (0.4, "Medium"),
+                                                (0.39, "High"), (0.0, "High"), (np.nan, "Unknown")])
+def test_risk_levels(probability, level):
+    assert get_risk_level(probability) == level
+    assert get_risk_levels(np.array([probability]))[0] == level
+
+
+def test_format_prediction():
+    prediction = format_prediction(0.8123)
+    assert prediction["probability"] == 81.2
+    assert prediction["risk_level"] == "Low"
+    assert prediction["message"].startswith("Your chances for a successful VBAC are favorable")
+
+
+@pytest.mark.parametrize("name", ["tolac_model.pkl", "tolac_model.json"])
+def test_score_file_marks_rows_with_missing_inputs_unknown(tmp_path, name):
+    input_file, output_file = tmp_path / "patients.csv", tmp_path / "scores.csv"
+    PATIENTS.to_csv(input_file, index=False)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("error", message=".*feature names")
+        assert score_file(str(input_file), str(output_file), os.path.join(MODELS_DIR, name), chunk_rows=3) == 4
+    scores = pd.read_csv(output_file)
+    assert scores["Risk Level"][1] == "Unknown" and np.isnan(scores["VBAC Probability"][1])
+
+    model, _, encoder = load_model(os.path.join(MODELS_DIR, name))
+    record = {"Mother's Age": "30", "Prior Births Now Living": "1", "Prior Births Now Dead": "0",
+              "Interval Since Last Live Birth": "24", "Number of Prenatal Visits": "12", "Pre-pregnancy BMI": "25.1",
+              "Weight Gain": "25", "Number of Previous Cesareans": "1", "Obstetric Estimate": "39",
+              "Mother's Race": "White", "Mother's Education": "Bachelors", "Payment Method": "Private Insurance"}
+    records = [record, dict(record, **{"Gestational Diabetes": "Y"}), dict(record, **{"Mother's Race": "Black"})]
+    X = pd.DataFrame([encoder.encode_record(r) for r in records], columns=encoder.feature_names)
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(scores["VBAC Probability"][[0, 2, 3]], expected, rtol=1e-9)
+    assert list(scores["Risk Level"][[0, 2, 3]]) == list(get_risk_levels(expected))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_cleaned_frame
+from sklearn.linear_model import LogisticRegression
+from streaming_logreg import collect_statistics, design_matrix, iter_chunks, train_streaming
+
+
+@pytest.fixture(scope="module")
+def cleaned():
+    return synthetic_cleaned_frame(3000, seed=3)
+
+
+def write(tmp_path, df):
+    path = tmp_path / "natality_2021.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_newton_fit_matches_liblinear(tmp_path, cleaned):
+    path = write(tmp_path, cleaned)
+    model, encoder, _ = train_streaming(path, chunk_rows=700)
+
+    _, medians, _, _, _ = collect_statistics(path, None, 100_000)
+    [(X, y, test)] = iter_chunks(path, None, 100_000)
+    design = design_matrix(X[~test], encoder, medians)
+    # liblinear penalizes its bias, so it is fitted as the last feature column
+    reference = LogisticRegression(solver="liblinear", fit_intercept=False, tol=1e-10, max_iter=1000)
+    reference.fit(design, y[~test])
+    np.testing.assert_allclose(np.append(model.coef_[0], model.intercept_), reference.coef_[0], atol=1e-4)
+
+
+def test_fit_does_not_depend_on_the_chunk_size(tmp_path, cleaned):
+    path = write(tmp_path, cleaned)
+    small, _, (y_small, p_small, _) = train_streaming(path, chunk_rows=333)
+    large, _, (y_large, p_large, _) = train_streaming(path, chunk_rows=100_000)
+    np.testing.assert_allclose(small.coef_, large.coef_, rtol=1e-8)
+    np.testing.assert_array_equal(y_small, y_large)
+    np.testing.assert_allclose(p_small, p_large, rtol=1e-8)
+
+
+def test_blank_numeric_column_is_dropped(tmp_path, cleaned):
+    path = write(tmp_path, cleaned.assign(**{"Weight Gain": np.nan}))
+    encoder, medians, _, _, constant = collect_statistics(path, None, 1000)
+    assert "Weight Gain" in constant and "Weight Gain" not in encoder.feature_names
+    model, _, (_, p, _) = train_streaming(path, chunk_rows=1000)
+    assert model.coef_.shape == (1, len(encoder.feature_names))
+    assert np.isfinite(p).all()